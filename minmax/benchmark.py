@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Benchmark of the searchers and move generators on a fixed corpus.
+
+Every engine that can finish a position in reasonable time solves it once
+timed, with a stats.SearchStats, and once more under tracemalloc for its
+peak memory. All engines must agree on the score of a position. Results can
+be saved as a json baseline and later runs compared against it.
+"""
+
+import importlib
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import landlord
+from stats import SearchStats
+from transposition import TranspositionTable, newTable
+
+tictactoe = importlib.import_module('tic-tac-toe')
+
+INF = float('inf')
+
+# name, board size, moves played from the empty board
+TICTACTOE = [
+    ('ttt3-empty', 3, []),
+    ('ttt3-mid', 3, [(1, 1), (0, 0), (0, 2)]),
+    ('ttt4-empty', 4, []),
+    ('ttt4-mid', 4, [(0, 0), (1, 1), (2, 2), (3, 3)]),
+]
+
+# name, lord's cards, farmer's cards; the first one is the deal of landlord.main()
+LANDLORD = [
+    ('landlord-main', 'Y A K K Q J 10 9 8 5 4', '2 A K Q J 10 9 9 7 7 3'),
+    ('landlord-straights', '3 3 4 4 5 5 6 7 8', '9 9 10 J J Q K'),
+    ('landlord-rocket', '2 2 A K K 7 7 7 3', 'Z Y 6 6 5 5 4'),
+    ('landlord-plane', '10 10 10 J J J 3 4 6', 'Q Q K K A A 2 5'),
+]
+
+# cases left out by --quick
+SLOW = ('ttt4-empty', 'landlord-main')
+
+# timings shorter than this are too noisy to call a regression
+MIN_ELAPSED = 0.05
+
+
+def tictactoeBoard(size, moves):
+    board = tictactoe.BitBoard(size)
+    for move in moves:
+        board.makeMove(board.currentPlayer(), move)
+    return board
+
+
+def landlordBoard(lord, farmer):
+    return landlord.Board(landlord.Card.convert(lord.split()), landlord.Card.convert(farmer.split()))
+
+
+def _retrograde(board, table, stats):
+    outcome, _, move = tictactoe.retrograde(board.cubsize).bestMove(board)
+    return outcome * 10, move
+
+
+def _deepening(board, table, stats):
+    score, move, _ = tictactoe.deepeningSearch(board, board.currentPlayer(), table=table, stats=stats)
+    return score, move
+
+
+def _landlordDeepening(board, table, stats):
+    score, move, _ = landlord.deepeningMinmax(board, table=table, ordering=landlord.MoveOrdering(), stats=stats)
+    return score, move
+
+
+def _landlordTurns(board, table, stats):
+    score, move, _ = landlord.deepeningMinmax(board, table=table, ordering=landlord.MoveOrdering(),
+                                              heuristic=landlord.turnsHeuristic, stats=stats)
+    return score, move
+
+
+def _landlordLazy(board, table, stats):
+    cache, landlord.MOVE_CACHE = landlord.MOVE_CACHE, None
+    try:
+        return landlord.minmax(board, -INF, INF, table, landlord.MoveOrdering(), stats=stats)
+    finally:
+        landlord.MOVE_CACHE = cache
+
+
+# name, most empty cells it gets, table factory, search(board, table, stats)
+# returning (score, move) with the score for the side to move
+TICTACTOE_ENGINES = [
+    ('minmax', 9, None,
+     lambda board, table, stats: tictactoe.minmax(board, board.currentPlayer(), stats)),
+    ('negamax', 9, None,
+     lambda board, table, stats: tictactoe.negamax(board, board.currentPlayer(), stats)),
+    ('alphabeta', 12, None,
+     lambda board, table, stats: tictactoe.alphabeta(board, board.currentPlayer(), -INF, INF, stats=stats)),
+    ('alphabeta-tt', 16, lambda: TranspositionTable(1 << 20),
+     lambda board, table, stats: tictactoe.alphabeta(board, board.currentPlayer(), -INF, INF, table, stats=stats)),
+    ('abnegamax-tt', 16, lambda: TranspositionTable(1 << 20),
+     lambda board, table, stats: tictactoe.abnegamax(board, board.currentPlayer(), -INF, INF, table, stats=stats)),
+    ('pvs-tt', 16, lambda: TranspositionTable(1 << 20),
+     lambda board, table, stats: tictactoe.pvs(board, board.currentPlayer(), -INF, INF, table, stats=stats)),
+    ('mtdf', 16, lambda: TranspositionTable(1 << 20),
+     lambda board, table, stats: tictactoe.mtdf(board, board.currentPlayer(), table=table, stats=stats)),
+    ('deepening', 16, lambda: TranspositionTable(1 << 20), _deepening),
+    ('symmetric', 16, lambda: tictactoe.SymmetricTable(1 << 20),
+     lambda board, table, stats: tictactoe.symmetricSearch(board, board.currentPlayer(), table, stats)),
+    ('retrograde', 9, None, _retrograde),
+]
+
+
+def _landlordProof(board, table, stats):
+    score, move, _ = landlord.proofNumberSearch(board, stats=stats)
+    return score, move
+
+
+# name, most cards it gets, table factory, search(board, table, stats)
+# returning (score, move) with the score for player 1
+LANDLORD_ENGINES = [
+    ('minmax', 16, None,
+     lambda board, table, stats: landlord.minmax(board, -INF, INF, stats=stats)),
+    ('minmax-tt', 40, lambda: newTable(1 << 20),
+     lambda board, table, stats: landlord.minmax(board, -INF, INF, table, stats=stats)),
+    ('minmax-ordering', 40, lambda: newTable(1 << 20),
+     lambda board, table, stats: landlord.minmax(board, -INF, INF, table, landlord.MoveOrdering(), stats=stats)),
+    ('minmax-killers', 40, lambda: newTable(1 << 20),
+     lambda board, table, stats: landlord.minmax(board, -INF, INF, table,
+                                                 landlord.MoveOrdering(killers=2, history=True, largest=True),
+                                                 stats=stats)),
+    ('minmax-lru', 40, lambda: newTable(1 << 20, 'lru'),
+     lambda board, table, stats: landlord.minmax(board, -INF, INF, table, landlord.MoveOrdering(), stats=stats)),
+    ('minmax-lazy', 40, lambda: newTable(1 << 20), _landlordLazy),
+    ('deepening', 40, lambda: newTable(1 << 20), _landlordDeepening),
+    ('deepening-turns', 40, lambda: newTable(1 << 20), _landlordTurns),
+    ('proof-number', 40, None, _landlordProof),
+]
+
+
+def measure(case, engine, makeBoard, makeTable, search, memory=True):
+    """
+    Solve a fresh board with search, return the result record. peak_kb is
+    the most memory allocated during the search, a table made beforehand
+    by makeTable not counted.
+    """
+    stats = SearchStats(engine)
+    table = makeTable and makeTable()
+    landlord.MOVE_CACHE = landlord.MoveGenCache()
+    board = makeBoard()
+    stats.start(table)
+    score, move = search(board, table, stats)
+    stats.stop(table)
+
+    result = stats.toDict()
+    result.update({'case': case, 'engine': engine, 'score': score, 'move': str(move)})
+
+    if memory:
+        table = makeTable and makeTable()
+        landlord.MOVE_CACHE = landlord.MoveGenCache()
+        board = makeBoard()
+        tracemalloc.start()
+        try:
+            search(board, table, None)
+            result['peak_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def moveGeneration(case, lord, farmer, rounds=200):
+    """
+    Time landlord.getNextMoves, bypassing MOVE_CACHE, on both hands of a
+    deal: every lead, and every answer of the other hand to every lead.
+    """
+    hands = [landlord.Hand(landlord.Card.convert(cards.split())) for cards in (lord, farmer)]
+    calls = []
+    for hand, other in (hands, hands[::-1]):
+        calls.append((hand, landlord.CardPattern.PASS, -1))
+        for move in landlord.getNextMoves(hand, landlord.CardPattern.PASS, -1):
+            calls.append((other, move.pattern, move.value))
+
+    moves = 0
+    start = time.time()
+    for i in range(rounds):
+        for hand, pattern, value in calls:
+            moves += len(landlord.getNextMoves(hand, pattern, value))
+    elapsed = time.time() - start
+    return {
+        'case': case,
+        'engine': 'getNextMoves',
+        'calls': len(calls) * rounds,
+        'moves': moves,
+        'elapsed': elapsed,
+        'calls_per_second': len(calls) * rounds / elapsed if elapsed else 0.0,
+    }
+
+
+def corpus(quick=False):
+    """(case, engine, makeBoard, makeTable, search) of every benchmark."""
+    for case, size, moves in TICTACTOE:
+        if quick and case in SLOW:
+            continue
+        empty = size * size - len(moves)
+        makeBoard = lambda size=size, moves=moves: tictactoeBoard(size, moves)
+        for engine, limit, makeTable, search in TICTACTOE_ENGINES:
+            if empty <= limit and (engine != 'retrograde' or size == 3):
+                yield case, engine, makeBoard, makeTable, search
+
+    for case, lord, farmer in LANDLORD:
+        if quick and case in SLOW:
+            continue
+        cards = len(lord.split()) + len(farmer.split())
+        makeBoard = lambda lord=lord, farmer=farmer: landlordBoard(lord, farmer)
+        for engine, limit, makeTable, search in LANDLORD_ENGINES:
+            if cards <= limit:
+                yield case, engine, makeBoard, makeTable, search
+
+
+def run(quick=False, memory=True, select=None, verbose=True):
+    results = []
+    for case, engine, makeBoard, makeTable, search in corpus(quick):
+        if select and select not in case and select not in engine:
+            continue
+        result = measure(case, engine, makeBoard, makeTable, search, memory)
+        results.append(result)
+        if verbose:
+            print('%-20s %-16s score %6s  nodes %9d  %8.3fs  %9.0f nodes/s  peak %s kB' % (
+                case, engine, result['score'], result['nodes'], result['elapsed'], result['nps'],
+                result.get('peak_kb', '-')))
+
+    for case, lord, farmer in LANDLORD:
+        if (quick and case in SLOW) or (select and select not in case and select not in 'getNextMoves'):
+            continue
+        result = moveGeneration(case, lord, farmer)
+        results.append(result)
+        if verbose:
+            print('%-20s %-16s calls %8d  moves %9d  %8.3fs  %9.0f calls/s' % (
+                case, 'getNextMoves', result['calls'], result['moves'], result['elapsed'],
+                result['calls_per_second']))
+    return results
+
+
+def disagreements(results):
+    """Cases whose engines do not all find the same score."""
+    scores = {}
+    for result in results:
+        if 'score' in result:
+            scores.setdefault(result['case'], {})[result['engine']] = result['score']
+    return dict((case, engines) for case, engines in scores.items() if len(set(engines.values())) > 1)
+
+
+def compare(results, baseline, tolerance=1.25):
+    """
+    Print every benchmark next to its baseline; returns the ones that got
+    slower by more than tolerance, or now search more nodes.
+    """
+    before = dict(((result['case'], result['engine']), result) for result in baseline['results'])
+    regressions = []
+    for result in results:
+        key = (result['case'], result['engine'])
+        if key not in before:
+            continue
+        old = before[key]
+        ratio = result['elapsed'] / old['elapsed'] if old['elapsed'] else 1.0
+        nodes = result.get('nodes', 0) - old.get('nodes', 0)
+        slower = (ratio > tolerance and result['elapsed'] > MIN_ELAPSED) or nodes > 0
+        if slower:
+            regressions.append(key)
+        print('%-20s %-16s %8.3fs -> %8.3fs  x%.2f  nodes %+d%s' % (
+            key[0], key[1], old['elapsed'], result['elapsed'], ratio, nodes, slower and '  REGRESSION' or ''))
+    return regressions
+
+
+if __name__ == '__main__':
+    from optparse import OptionParser
+
+    parser = OptionParser()
+    parser.add_option('-q', '--quick', dest='quick', action='store_true', default=False, help='skip the slow positions')
+    parser.add_option('-M', '--no-memory', dest='memory', action='store_false', default=True, help='skip the tracemalloc runs')
+    parser.add_option('-k', '--select', dest='select', action='store', default=None, help='only cases or engines containing this')
+    parser.add_option('-o', '--save', dest='save', action='store', default=None, help='save the results as a json baseline')
+    parser.add_option('-c', '--compare', dest='compare', action='store', default=None, help='compare with a json baseline')
+    parser.add_option('-t', '--tolerance', dest='tolerance', action='store', type='float', default=1.25, help='slowdown that counts as a regression')
+    opts, args = parser.parse_args()
+
+    results = run(opts.quick, opts.memory, opts.select)
+    status = 0
+
+    wrong = disagreements(results)
+    for case, engines in sorted(wrong.items()):
+        print('%s: engines disagree: %s' % (case, engines))
+        status = 1
+
+    if opts.compare:
+        with open(opts.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, opts.tolerance):
+            status = 1
+
+    if opts.save:
+        with open(opts.save, 'w') as f:
+            json.dump({'python': platform.python_version(), 'time': time.time(), 'results': results}, f,
+                      indent=1, sort_keys=True)
+
+    sys.exit(status)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import time
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class Budget:
+    """
+    Wall clock and/or node budget of one search. Searchers call tick() once
+    per node, which raises SearchTimeout when the budget is spent.
+    """
+    def __init__(self, seconds=None, nodes=None):
+        self.deadline = None
+        if seconds is not None:
+            self.deadline = time.time() + seconds
+        self.max_nodes = nodes
+        self.nodes = 0
+
+    def tick(self):
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise SearchTimeout()
+        # reading the clock costs more than a node, only look now and then
+        if self.deadline is not None and self.nodes & 0xff == 0 and time.time() > self.deadline:
+            raise SearchTimeout()
+
+
+def iterativeDeepening(search, maxDepth, solved=None):
+    """
+    Call search(depth) for depth 1, 2, ... maxDepth, until it raises
+    SearchTimeout or returns a score whose magnitude reaches solved.
+
+    Returns (score, move, depth) of the deepest search that completed,
+    (None, None, 0) if not even the first one did.
+    """
+    score, move, completed = None, None, 0
+    for depth in range(1, maxDepth + 1):
+        try:
+            score, move = search(depth)
+        except SearchTimeout:
+            break
+        completed = depth
+        if solved is not None and abs(score) >= solved:
+            break
+    return score, move, completed
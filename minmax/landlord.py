@@ -1,9 +1,21 @@
 #!/usr/bin/env python
 # encoding: utf-8
 
-import copy
+import multiprocessing
+import random
+import time
+import weakref
+from collections import OrderedDict
+from functools import partial
 from itertools import combinations
 
+from transposition import LRUCache, newTable, lookup, boundFlag
+from deepening import Budget, SearchTimeout, iterativeDeepening
+from parallel import poolMap, rootSplit, workerState
+from stats import SearchStats
+from mcts import MCTS
+from proofnumber import ProofNumberSearch
+
 
 class Card:
     THREE, FOUR, FIVE, SIX, SEVEN, EIGHT, NINE, TEN, JACK, QUEEN, KING, ACE, TWO, BJOKER, RJOKER = range(3, 18)
@@ -14,7 +26,7 @@ class Card:
             '3': 3, '4': 4,  '5': 5, '6': 6, '7': 7, '8': 8, '9': 9, '10': 10,
             'J': 11, 'Q': 12, 'K': 13, 'A': 14, '2': 15, 'Y': 16, 'Z': 17
         }
-        return map(lambda i: cards_dict.get(i, None), cards)
+        return [cards_dict.get(i, None) for i in cards]
 
     @classmethod
     def revert(cls, values):
@@ -22,7 +34,7 @@ class Card:
             3: '3', 4: '4', 5: '5', 6: '6', 7: '7', 8: '8', 9: '9', 10: '10',
             11: 'J', 12: 'Q', 13: 'K', 14: 'A', 15: '2', 16: 'Y', 17: 'Z'
         }
-        return map(lambda i: values_dict.get(i, None), values)
+        return [values_dict.get(i, None) for i in values]
 
 
 class CardPattern:
@@ -35,77 +47,98 @@ class CardPattern:
     TRIPLE_ONE = 5
     TRIPLE_TWO = 6
 
+    # straights of n singles are n + 2, of n pairs n + 12, of n triples n + 21
+    # and planes of n triples with n kickers n + 26
     STRIGHT = 10
-    QUADS_ONES = 7
-    QUADS_PAIRS = 8
+    QUADS_ONES = 33
+    QUADS_PAIRS = 34
     INVALID = float('inf')
 
-class Move:
-    def __init__(self, cards, pattern=None, value=None):
-        self.cards = cards
-        self.pattern = pattern
-        self.value = value
+
+def isRun(ranks):
+    return ranks[-1] - ranks[0] == len(ranks) - 1 and ranks[-1] <= Card.ACE
+
+
+def cardPattern(cards):
+    """(pattern, value) of cards played as one move, (INVALID, None) when they are not one."""
+    cards = sorted(cards)
+    counts = {}
+    for card in cards:
+        counts[card] = counts.get(card, 0) + 1
+    ranks = sorted(counts)
+    most = max(counts.values()) if counts else 0
+    top = [card for card in ranks if counts[card] == most]
+
+    if len(cards) == 0:
+        return CardPattern.PASS, -1
+    if len(cards) == 1:
+        return CardPattern.SINGLE, cards[0]
+    if len(cards) == 2 and Card.BJOKER in cards and Card.RJOKER in cards:
+        return CardPattern.ROCKET, 100
+    if len(cards) == 2 and most == 2:
+        return CardPattern.PAIR, cards[0]
+    if len(cards) == 3 and most == 3:
+        return CardPattern.TRIPLE, cards[0]
+    if len(cards) == 4 and most == 4:
+        return CardPattern.BOMB, cards[0]
+    if len(cards) == 4 and most == 3:
+        return CardPattern.TRIPLE_ONE, top[0]
+    if len(cards) == 5 and most == 3 and len(ranks) == 2:
+        return CardPattern.TRIPLE_TWO, top[0]
+    if len(cards) == 6 and most == 4 and len(ranks) == 3:
+        return CardPattern.QUADS_ONES, top[0]
+    if len(cards) == 8 and most == 4 and len(top) == 1 and len(ranks) == 3 and \
+            all(counts[card] == 2 for card in ranks if card != top[0]):
+        return CardPattern.QUADS_PAIRS, top[0]
+    if len(cards) >= 5 and most == 1 and isRun(ranks):
+        return len(cards) + 2, cards[0]
+    if len(ranks) >= 3 and most == 2 and len(top) == len(ranks) and isRun(ranks):
+        return len(ranks) + 12, cards[0]
+    if len(ranks) >= 2 and most == 3 and len(top) == len(ranks) and isRun(ranks):
+        return len(ranks) + 21, cards[0]
+    if most == 3 and len(top) >= 2 and len(cards) == len(top) * 4 and \
+            len(ranks) == len(top) * 2 and isRun(top):
+        return len(top) + 26, top[0]
+    return CardPattern.INVALID, None
+
+
+class Move(object):
+    """
+    Immutable move: cards are kept as a sorted tuple and instances are
+    interned on (cards, pattern, value), so equal moves are the same object
+    and compare and hash by identity. Interning holds moves weakly, a move
+    nothing refers to any more is freed.
+    """
+    __slots__ = ('cards', 'pattern', 'value', '__weakref__')
+    _interned = weakref.WeakValueDictionary()
+
+    def __new__(cls, cards, pattern=None, value=None):
+        cards = tuple(sorted(cards))
+        key = (cards, pattern, value)
+        move = cls._interned.get(key)
+        if move is None:
+            move = object.__new__(cls)
+            object.__setattr__(move, 'cards', cards)
+            object.__setattr__(move, 'pattern', pattern)
+            object.__setattr__(move, 'value', value)
+            cls._interned[key] = move
+        return move
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Move is immutable')
+
+    def __reduce__(self):
+        return (Move, (self.cards, self.pattern, self.value))
 
     def parse(self):
-        cards = self.cards
-        if len(cards) == 0:
-            self.pattern = CardPattern.PASS
-            self.value = -1
-            return
-        if len(cards) == 1:
-            self.pattern = CardPattern.SINGLE
-            self.value = cards[0]
-            return
-        if len(cards) == 2 and Card.BJOKER in cards and Card.RJOKER in cards:
-            self.pattern = CardPattern.ROCKET
-            self.value = 100
-            return
-        if len(cards) == 2 and cards.count(cards[0]) == 2:
-            self.pattern = CardPattern.PAIR
-            self.value = cards[0]
-            return
-        if len(cards) == 3 and cards.count(cards[0]) == 3:
-            self.pattern = CardPattern.TRIPLE
-            self.value = cards[0]
-            return
-        if len(cards) == 4 and cards.count(cards[0]) == 4:
-            self.pattern = CardPattern.BOMB
-            self.value = cards[0]
-            return
-        if len(cards) == 4 and len(set(cards)) == 2:
-            self.pattern = CardPattern.TRIPLE_ONE
-            self. value = cards[0]
-            return
-        if len(cards) == 5 and len(set(cards)) == 2 and cards.count(cards[0]) == 3:
-            self.pattern = CardPattern.TRIPLE_TWO
-            self.value = cards[0]
-            return
-        if len(cards) == 6 and cards.count(cards[0]) == 4:
-            self.pattern = CardPattern.QUADS_ONES
-            self.value = cards[0]
-            return
-        if len(cards) == 8 and cards.count(cards[0]) == 4:
-            self.pattern = CardPattern.QUADS_PAIRS
-            self.value = cards[0]
-            return
-        if len(cards) >= 5 and (cards[-1] - cards[0]) == len(cards) - 1:
-            self.pattern = len(cards) + 2
-            self.value = cards[0]
-            return
-        if len(cards) >= 6 and (cards[-1] - cards[0]) == len(cards) / 2 - 1:
-            self.pattern = len(cards) + 12
-            self.value = cards[0]
-            return
-        return CardPattern.INVALID
+        """Return the same cards as a Move with its pattern and value set."""
+        return Move(self.cards, *cardPattern(self.cards))
 
     def __str__(self):
         return str(Card.revert(self.cards))
 
     def __repr__(self):
-        return 'Move(%s, %d, %d)' % (self.__str__(), self.pattern, self.value)
-
-    def __cmp__(self, o):
-        return cmp(sorted(self.cards), sorted(o.cards))
+        return 'Move(%s, %s, %s)' % (self.__str__(), self.pattern, self.value)
 
     def __contains__(self, v):
         return v in self.cards
@@ -114,13 +147,90 @@ class Move:
         return iter(self.cards)
 
 
+class Hand:
+    """
+    Cards of one player kept as a count per rank, slot 0 being Card.THREE and
+    slot 14 Card.RJOKER, so move generation can read counts directly.
+    """
+    def __init__(self, cards=None):
+        self.counts = [0] * 15
+        self.size = 0
+        # counts packed 3 bits per rank, a cheap key of the hand's contents
+        self.sig = 0
+        for card in cards or []:
+            self.add(card)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for card in range(Card.THREE, Card.RJOKER + 1):
+            for i in range(self.counts[card - Card.THREE]):
+                yield card
+
+    def __contains__(self, card):
+        return self.counts[card - Card.THREE] > 0
+
+    def count(self, card):
+        return self.counts[card - Card.THREE]
+
+    def ranks(self):
+        return [i + Card.THREE for i, count in enumerate(self.counts) if count]
+
+    def mask(self, num):
+        """Bit i set when rank Card.THREE + i, up to Card.ACE, is held num times or more."""
+        counts = self.counts
+        return sum(1 << i for i in range(Card.ACE - Card.THREE + 1) if counts[i] >= num)
+
+    def add(self, card, num=1):
+        self.counts[card - Card.THREE] += num
+        self.size += num
+        self.sig += num << 3 * (card - Card.THREE)
+
+    def remove(self, card, num=1):
+        if self.counts[card - Card.THREE] < num:
+            raise ValueError('Hand.remove(x): not enough x in hand')
+        self.counts[card - Card.THREE] -= num
+        self.size -= num
+        self.sig -= num << 3 * (card - Card.THREE)
+
+
+def _zobristCards():
+    rand = random.Random(17)
+    # [player][card][count], a card held zero times adds nothing to the key
+    return [[[0] + [rand.getrandbits(64) for count in range(4)] for card in range(Card.RJOKER + 1)]
+            for player in range(2)]
+
+
+ZOBRIST_CARDS = _zobristCards()
+ZOBRIST_SIDE = random.Random(18).getrandbits(64)
+_ZOBRIST_LAST = {}
+
+
+def lastMoveKey(move):
+    """
+    Key of the move to beat; only its pattern and value decide what can be
+    played next, so a lead (no move or a pass) adds nothing to the key.
+    """
+    if move is None or move.pattern == CardPattern.PASS:
+        return 0
+    index = (move.pattern, move.value)
+    if index not in _ZOBRIST_LAST:
+        # seeded from the pattern and value only, keys must not change between
+        # runs: tablebases on disk are indexed by them
+        _ZOBRIST_LAST[index] = random.Random((move.pattern + 1) * 1024 + move.value + 1).getrandbits(64)
+    return _ZOBRIST_LAST[index]
+
+
 class Board:
-    def __init__(self):
+    def __init__(self, playerA=None, playerB=None, lastMove=None):
         self.current_player = 0
-        self.playerA = []
-        self.playerB = []
-        self.records = []
+        self.playerA = Hand(playerA)
+        self.playerB = Hand(playerB)
+        # lastMove is a move the lord has to beat, as played by the farmer
+        self.records = lastMove and [lastMove] or []
         self.patterns = []
+        self.key = self.rehash()
 
     def __str__(self):
         s = ''
@@ -130,8 +240,16 @@ class Board:
         return s
 
     def __hash__(self):
-        record = self.records and self.records[-1].cards or []
-        return hash(str((sorted(self.playerA), sorted(self.playerB), sorted(record))))
+        return self.key
+
+    def rehash(self):
+        key = 0
+        for player, hand in enumerate((self.playerA, self.playerB)):
+            for card in hand.ranks():
+                key ^= ZOBRIST_CARDS[player][card][hand.count(card)]
+        if self.current_player == 1:
+            key ^= ZOBRIST_SIDE
+        return key ^ lastMoveKey(self.records and self.records[-1] or None)
 
     def isGameOver(self):
         return len(self.playerA) == 0 or len(self.playerB) == 0
@@ -141,23 +259,30 @@ class Board:
 
     def makeMove(self, move):
         if not move:
-            move = Move([])
+            move = Move([], CardPattern.PASS, -1)
 
         if self.current_player == 0:
             player = self.playerA
         else:
             player = self.playerB
 
-        for i in move:
-            player.remove(i)
+        zobrist = ZOBRIST_CARDS[self.current_player]
+        for card in set(move.cards):
+            count = player.count(card)
+            num = move.cards.count(card)
+            player.remove(card, num)
+            self.key ^= zobrist[card][count] ^ zobrist[card][count - num]
+        self.key ^= lastMoveKey(self.records and self.records[-1] or None) ^ lastMoveKey(move)
         self.records.append(move)
 
         if not self.isGameOver():
             self.current_player = (self.current_player + 1) % 2
+            self.key ^= ZOBRIST_SIDE
 
     def unmakeMove(self, move):
         if not self.isGameOver():
             self.current_player = (self.current_player + 1) % 2
+            self.key ^= ZOBRIST_SIDE
 
         if self.current_player == 0:
             player = self.playerA
@@ -165,167 +290,309 @@ class Board:
             player = self.playerB
 
         last_move = self.records.pop()
-        for i in last_move:
-            player.append(i)
-        # player = sorted(player)
+        self.key ^= lastMoveKey(last_move) ^ lastMoveKey(self.records and self.records[-1] or None)
+        zobrist = ZOBRIST_CARDS[self.current_player]
+        for card in set(last_move.cards):
+            count = player.count(card)
+            num = last_move.cards.count(card)
+            player.add(card, num)
+            self.key ^= zobrist[card][count] ^ zobrist[card][count + num]
 
     def getNextMoves(self):
         if self.records:
             last_move = self.records[-1]
         else:
-            last_move = Move([])
+            last_move = Move([], CardPattern.PASS, -1)
 
         if self.current_player == 0:
             player = self.playerA
         else:
             player = self.playerB
 
+        if MOVE_CACHE is not None:
+            return MOVE_CACHE.getNextMoves(player, last_move.pattern, last_move.value)
         return getNextMoves(player, last_move.pattern, last_move.value)
 
 
-def getSequence(cards, length, value, num):
-    if len(cards) < length * num:
+_WINDOWS = {}
+_SEQUENCES = {}
+
+
+def sequenceWindows(mask, length):
+    """
+    Start ranks of every run of length consecutive ranks set in mask, as
+    built by Hand.mask; there are only 4096 masks, so runs are looked up once.
+    """
+    index = (mask, length)
+    if index not in _WINDOWS:
+        window = (1 << length) - 1
+        _WINDOWS[index] = tuple(Card.THREE + i for i in range(Card.ACE - Card.THREE + 2 - length)
+                                if mask >> i & window == window)
+    return _WINDOWS[index]
+
+
+def sequenceMove(start, length, num):
+    index = (start, length, num)
+    if index not in _SEQUENCES:
+        pattern = length + {1: 2, 2: 12, 3: 21}[num]
+        _SEQUENCES[index] = Move([i for i in range(start, start + length) for j in range(num)], pattern, start)
+    return _SEQUENCES[index]
+
+
+def getSequence(hand, length, value, num):
+    if len(hand) < length * num:
         return []
 
-    card_count = {}
-    for card in cards:
-        card_count[card] = card_count.get(card, 0) + 1
-
-    res = []
-    seq = []
-    for card in sorted(card_count.keys()):
-        if (len(seq) == 0 and card > value and card <= Card.ACE and card_count[card] >= num) or \
-              (len(seq) != 0 and seq[-1] + 1 == card and card <= Card.ACE and card_count[card] >= num):
-            seq = seq + [card] * num
-        else:
-            seq = [card] * num
-        if len(seq) == length * num:
-            pattern = -1
-            if num == 1:
-                pattern = length + 2
-            elif num == 2:
-                pattern = length + 12
-            res.append(Move(copy.deepcopy(seq), pattern, seq[0]))
-            seq = seq[num:]
-    return res
-
-def getPlane(cards, length, size):
+    return [sequenceMove(start, length, num) for start in sequenceWindows(hand.mask(num), length) if start > value]
+
+def getPlane(hand, length, size):
     ans = []
-    seq = []
-    if len(cards) >= length * 4:
-        for card in list(set(cards)):
-            if ((len(seq) == 0 and card > size and card < 12 and cards.count(card) >= 3) or
-                (len(seq) != 0 and seq[-1] + 1 == card and card < 12 and cards.count(card) >= 3)):
-                seq = seq + [card] * 3
-            else:
-                seq = []
-            if len(seq) == length * 3:
-                cardBs = list(set(cards) - set(seq))
-                for case in list(combinations(cardBs, length)):
-                    newSeq = seq + list(case)
-                    ans.append({ 'c': newSeq, 'p': length + 26, 's': seq[0] })
-                seq = seq[3:]
+    if len(hand) < length * 4:
+        return ans
+
+    for start in sequenceWindows(hand.mask(3), length):
+        if start > size:
+            seq = sequenceMove(start, length, 3).cards
+            cardBs = [i for i in hand.ranks() if i < start or i >= start + length]
+            for case in combinations(cardBs, length):
+                ans.append(Move(seq + case, length + 26, start))
     return ans
 
-def getNextMoves(cards, pattern, value):
-    card_count = {}
-    for card in cards:
-        card_count[card] = card_count.get(card, 0) + 1
+def moveStages(hand, pattern, value):
+    """
+    The moves of hand against a move of pattern and value, one category at a
+    time and cheapest first: rocket, bombs, straights, triples with and
+    without kickers, pairs, singles, then planes and quads with kickers,
+    whose kicker combinations are only enumerated when this gets that far,
+    and the pass. A generator of move lists.
+    """
+    counts = hand.counts
+    ranks = hand.ranks()
 
-    moves = []
     # Rocket
-    if Card.BJOKER in cards and Card.RJOKER in cards:
-        moves.append(Move([Card.BJOKER, Card.RJOKER], CardPattern.ROCKET, 100))
+    if counts[Card.BJOKER - Card.THREE] and counts[Card.RJOKER - Card.THREE]:
+        yield [Move([Card.BJOKER, Card.RJOKER], CardPattern.ROCKET, 100)]
     # Bomb
     if pattern != CardPattern.ROCKET:
-        for card in card_count:
-            if card_count[card] == 4 and (pattern != CardPattern.BOMB or (pattern == CardPattern.BOMB and card > value)):
-                moves.append(Move([card] * 4, CardPattern.BOMB, card))
+        yield [Move([card] * 4, CardPattern.BOMB, card) for card in ranks
+               if counts[card - Card.THREE] == 4 and (pattern != CardPattern.BOMB or card > value)]
     # Single Stright
     if pattern == CardPattern.PASS:
         for length in range(5, 13):
-            if length <= len(cards):
-                moves = moves + getSequence(cards, length, -1, 1)
-    if pattern >= 7 and pattern <= 12:
-        moves = moves + getSequence(cards, pattern - 2, value, 1)
+            if length <= len(hand):
+                yield getSequence(hand, length, -1, 1)
+    if pattern >= 7 and pattern <= 14:
+        yield getSequence(hand, pattern - 2, value, 1)
     # Double Stright
     if pattern == CardPattern.PASS:
         for length in range(3, 11):
-            if length < len(cards):
-                moves = moves + getSequence(cards, length, -1, 2)
+            if length < len(hand):
+                yield getSequence(hand, length, -1, 2)
     if pattern >= 15 and pattern <= 22:
-        moves = moves + getSequence(cards, pattern - 12, value, 2)
+        yield getSequence(hand, pattern - 12, value, 2)
     # Triple Stright
     if pattern == CardPattern.PASS:
         for length in range(2, 7):
-            moves = moves + getSequence(cards, length, -1, 3)
+            yield getSequence(hand, length, -1, 3)
     if pattern >= 23 and pattern <= 27:
-        moves = moves + getSequence(cards, pattern - 21, value, 3)
+        yield getSequence(hand, pattern - 21, value, 3)
     # Triple with one pair
     if pattern == CardPattern.PASS or pattern == CardPattern.TRIPLE_TWO:
-        for card in card_count:
-            if card_count[card] >= 3 and card > value:
-                for cardB in card_count:
-                    if card != cardB and card_count[cardB] >= 2:
-                        moves.append(Move([card] * 3 + [cardB] * 2, CardPattern.TRIPLE_TWO, card))
+        yield [Move([card] * 3 + [cardB] * 2, CardPattern.TRIPLE_TWO, card)
+               for card in ranks if counts[card - Card.THREE] >= 3 and card > value
+               for cardB in ranks if card != cardB and counts[cardB - Card.THREE] >= 2]
     # Triple with one single
     if pattern == CardPattern.PASS or pattern == CardPattern.TRIPLE_ONE:
-        for card in card_count:
-            if card_count[card] >= 3 and card > value:
-                for cardB in card_count:
-                    if card != cardB:
-                        moves.append(Move([card] * 3 + [cardB], CardPattern.TRIPLE_ONE, card))
+        yield [Move([card] * 3 + [cardB], CardPattern.TRIPLE_ONE, card)
+               for card in ranks if counts[card - Card.THREE] >= 3 and card > value
+               for cardB in ranks if card != cardB]
     # Triple
     if pattern == CardPattern.PASS or pattern == CardPattern.TRIPLE:
-        for card in card_count:
-            if card_count[card] >= 3 and card > value:
-                moves.append(Move([card] * 3, CardPattern.TRIPLE, card))
+        yield [Move([card] * 3, CardPattern.TRIPLE, card) for card in ranks
+               if counts[card - Card.THREE] >= 3 and card > value]
     # Pair
     if pattern == CardPattern.PASS or pattern == CardPattern.PAIR:
-        for card in card_count:
-            if card_count[card] >= 2 and card > value:
-                moves.append(Move([card] * 2, CardPattern.PAIR, card))
+        yield [Move([card] * 2, CardPattern.PAIR, card) for card in ranks
+               if counts[card - Card.THREE] >= 2 and card > value]
     # Single
     if pattern == CardPattern.PASS or pattern == CardPattern.SINGLE:
-        for card in card_count:
-            if card > value:
-                moves.append(Move([card], CardPattern.SINGLE, card))
-
+        yield [Move([card], CardPattern.SINGLE, card) for card in ranks if card > value]
 
     # Plane
     if pattern == -1:
         for length in range(2, 7):
-            moves = moves + getPlane(cards, length, -1)
+            yield getPlane(hand, length, -1)
     if pattern >= 28 and pattern <= 32:
-        moves = moves + getPlane(cards, pattern - 26, value)
+        yield getPlane(hand, pattern - 26, value)
     # Quads with two singles
-    if pattern == -1 or pattern == 33:
-        for card in set(cards):
-            if cards.count(card) >= 4 and card > value:
-                cardBs = list(set(cards) - set([card]))
-                for case in list(combinations(cardBs, 2)):
-                    moves.append(Move([card] * 4 + list(case), 33, card))
+    if pattern == CardPattern.PASS or pattern == CardPattern.QUADS_ONES:
+        for card in ranks:
+            if counts[card - Card.THREE] >= 4 and card > value:
+                cardBs = [cardB for cardB in ranks if cardB != card]
+                yield [Move([card] * 4 + list(case), CardPattern.QUADS_ONES, card)
+                       for case in combinations(cardBs, 2)]
     # Quads with two pairs
-    if pattern == -1 or pattern == 34:
-        for card in set(cards):
-            if cards.count(card) >= 4 and card > value:
-                cardBs = list(set(cards) - set([card]))
-                for case in list(combinations(cardBs, 2)):
-                    flag = True
-                    for element in list(case):
-                        if cards.count(element) < 2:
-                            flag = False
-                            break
-                    if flag:
-                        moves.append(Move([card] * 4 + list(case) * 2, 34, card))
+    if pattern == CardPattern.PASS or pattern == CardPattern.QUADS_PAIRS:
+        for card in ranks:
+            if counts[card - Card.THREE] >= 4 and card > value:
+                cardBs = [cardB for cardB in ranks if cardB != card and counts[cardB - Card.THREE] >= 2]
+                yield [Move([card] * 4 + list(case) * 2, CardPattern.QUADS_PAIRS, card)
+                       for case in combinations(cardBs, 2)]
 
     # Pass
     if pattern != CardPattern.PASS:
-        moves.append(Move([], CardPattern.PASS, -1))
+        yield [Move([], CardPattern.PASS, -1)]
 
+
+def getNextMoves(hand, pattern, value):
+    if not isinstance(hand, Hand):
+        hand = Hand(hand)
+    moves = []
+    for stage in moveStages(hand, pattern, value):
+        moves.extend(stage)
     return moves
 
 
+def beats(move, pattern, value):
+    """Whether a well-formed move may be played on one of pattern and value."""
+    return patternBeats(move.pattern, move.value, pattern, value)
+
+
+def patternBeats(movePattern, moveValue, pattern, value):
+    """beats() for a move known only by its pattern and value."""
+    if movePattern == CardPattern.INVALID:
+        return False
+    if movePattern == CardPattern.PASS:
+        return pattern != CardPattern.PASS
+    if movePattern == CardPattern.ROCKET:
+        return True
+    if movePattern == CardPattern.BOMB:
+        return pattern != CardPattern.ROCKET and (pattern != CardPattern.BOMB or moveValue > value)
+    if pattern == CardPattern.PASS:
+        return True
+    return movePattern == pattern and moveValue > value
+
+
+def holds(hand, move):
+    """Whether hand has every card of move."""
+    counts = hand.counts
+    return all(counts[card - Card.THREE] >= move.cards.count(card) for card in set(move.cards))
+
+
+def legalMove(board, cards):
+    """
+    The Move the side to move makes by playing cards, or None when that is
+    not legal: not a well-formed move, not enough to beat the last one or
+    not in its hand. Checks the cards alone, without generating the other
+    moves, and agrees with getNextMoves; a Move is only built for a legal
+    play, so bogus input leaves nothing behind.
+    """
+    if board.current_player == 0:
+        hand = board.playerA
+    else:
+        hand = board.playerB
+    if len(cards) > len(hand):
+        return None
+    counts = {}
+    for card in cards:
+        if card is None or not Card.THREE <= card <= Card.RJOKER:
+            return None
+        counts[card] = counts.get(card, 0) + 1
+    if any(hand.count(card) < num for card, num in counts.items()):
+        return None
+
+    pattern, value = cardPattern(cards)
+    if board.records:
+        last_move = board.records[-1]
+        if not patternBeats(pattern, value, last_move.pattern, last_move.value):
+            return None
+    elif not patternBeats(pattern, value, CardPattern.PASS, -1):
+        return None
+    return Move(cards, pattern, value)
+
+
+def legalMoveSet(board):
+    """
+    The moves of board by their sorted cards, which are a canonical key of
+    the multiset played; a move generated more than once is kept once.
+    """
+    return dict((move.cards, move) for move in board.getNextMoves())
+
+
+_FINISHING = {}
+
+
+def finishingMove(hand):
+    """The whole hand parsed as one move, INVALID when it is not one."""
+    move = _FINISHING.get(hand.sig)
+    if move is None:
+        if len(_FINISHING) >= 1 << 16:
+            _FINISHING.clear()
+        cards = tuple(hand)
+        move = _FINISHING[hand.sig] = Move(cards, *cardPattern(cards))
+    return move
+
+
+def lazyMoves(board, ordering=None, ply=0, ttMove=None):
+    """
+    The moves of board in about the order MoveOrdering gives them, generated
+    as the search asks for them: the move that empties the hand, the table's
+    move and the killers, if legal here, then moveStages, every stage sorted
+    by history.
+    """
+    if board.records:
+        last_move = board.records[-1]
+    else:
+        last_move = Move([], CardPattern.PASS, -1)
+    pattern, value = last_move.pattern, last_move.value
+    if board.current_player == 0:
+        hand = board.playerA
+    else:
+        hand = board.playerB
+
+    if ordering is None:
+        first = [finishingMove(hand), ttMove]
+    else:
+        first = [ordering.by_finishing and finishingMove(hand) or None, ordering.by_table and ttMove or None]
+        first.extend(ordering.killers.get((board.current_player, ply), ()))
+    seen = set()
+    for move in first:
+        if move is None or move in seen or not beats(move, pattern, value):
+            continue
+        if holds(hand, move):
+            seen.add(move)
+            yield move
+
+    history = ordering is not None and ordering.by_history and ordering.history
+    player = board.current_player
+    for stage in moveStages(hand, pattern, value):
+        if history and len(stage) > 1:
+            stage = sorted(stage, key=lambda move: history.get((player, move), 0), reverse=True)
+        for move in stage:
+            if move not in seen:
+                yield move
+
+
+class MoveGenCache(LRUCache):
+    """
+    Bounded LRU memo of getNextMoves, keyed by the hand's rank counts and the
+    pattern and value of the move to beat, which fully decide its output.
+    Cached move lists are shared, callers must not modify them.
+    """
+    def getNextMoves(self, hand, pattern, value):
+        key = (hand.sig, pattern, value)
+        moves = self.get(key)
+        if moves is None:
+            moves = tuple(getNextMoves(hand, pattern, value))
+            self.put(key, moves)
+        return moves
+
+
+# used by Board.getNextMoves, set to None to generate every move list afresh;
+# minmax then generates its moves lazily instead, see lazyMoves
+MOVE_CACHE = MoveGenCache()
+
+
 def evaluate(board):
     if board.currentPlayer() == 1:
         return 10
@@ -333,14 +600,280 @@ def evaluate(board):
         return -10
 
 
-def minmax(board, alpha, beta, cache = {}):
+def heuristic(board):
+    """
+    Static score of an unfinished game for depth-limited search, from player
+    1's point of view: the distinct ranks left approximate the plays each side
+    still needs, plus a point for being on move. Stays strictly between -10
+    and 10.
+    """
+    lord = len(board.playerA.ranks())
+    farmer = len(board.playerB.ranks())
+    score = 8.0 * (lord - farmer) / (lord + farmer)
+    if board.currentPlayer() == 1:
+        return score + 1
+    else:
+        return score - 1
+
+
+class TurnsCache(LRUCache):
+    """
+    Bounded LRU memo of minTurns, keyed by the hand's rank counts, which
+    alone decide how few plays can empty it. One is shared by every search.
+    """
+    def __init__(self, size=1 << 18):
+        LRUCache.__init__(self, size)
+
+
+TURNS_CACHE = TurnsCache()
+
+
+def approximateTurns(hand):
+    """
+    Quick estimate of minTurns: runs of five or more ranks held once or
+    twice are played as straights, then one play per rank is left, the
+    rocket being one and every triple taking a single or a pair along.
+    Planes and quads with kickers are not looked for, so it may be too high.
+    """
+    counts = list(hand.counts)
+    straights = 0
+    start = 0
+    for end in range(Card.ACE - Card.THREE + 2):
+        if end <= Card.ACE - Card.THREE and 0 < counts[end] < 3:
+            continue
+        if end - start >= 5:
+            straights += 1
+            for i in range(start, end):
+                counts[i] -= 1
+        start = end + 1
+
+    groups = [0] * 5
+    for count in counts:
+        groups[count] += 1
+    singles, pairs, triples, bombs = groups[1], groups[2], groups[3], groups[4]
+    rocket = counts[Card.BJOKER - Card.THREE] and counts[Card.RJOKER - Card.THREE]
+    if rocket:
+        singles -= 2
+    return straights + rocket + bombs + triples + max(singles + pairs - triples, 0)
+
+
+def _minTurns(hand, cache):
+    if not hand.size:
+        return 0
+    turns = cache.get(hand.sig)
+    if turns is not None:
+        return turns
+
+    if finishingMove(hand).pattern != CardPattern.INVALID:
+        turns = 1
+    else:
+        # playing every rank on its own always works; some play has to take
+        # the lowest rank, so only the leads holding it need trying
+        turns = len(hand.ranks())
+        lowest = hand.ranks()[0]
+        moves = [move for stage in moveStages(hand, CardPattern.PASS, -1) for move in stage if lowest in move]
+        for move in moves:
+            if turns == 2:
+                break
+            cards = set(move.cards)
+            for card in cards:
+                hand.remove(card, move.cards.count(card))
+            turns = min(turns, 1 + _minTurns(hand, cache))
+            for card in cards:
+                hand.add(card, move.cards.count(card))
+
+    cache.put(hand.sig, turns)
+    return turns
+
+
+def minTurns(hand, approximate=False, cache=None):
+    """
+    Fewest plays that empty hand (a Hand or a list of cards) when leading
+    every time, over the same straights, planes, triples with kickers,
+    bombs and so on that getNextMoves generates. Exact results are memoized
+    in cache, TURNS_CACHE by default; approximate uses approximateTurns.
+    """
+    if not isinstance(hand, Hand):
+        hand = Hand(hand)
+    if approximate:
+        return approximateTurns(hand)
+    return _minTurns(hand, TURNS_CACHE if cache is None else cache)
+
+
+def turnsHeuristic(board, approximate=False):
+    """
+    Same scale as heuristic, but with each side's minTurns in place of its
+    distinct ranks, a much closer count of the plays it still needs.
+    """
+    lord = minTurns(board.playerA, approximate)
+    farmer = minTurns(board.playerB, approximate)
+    score = 8.0 * (lord - farmer) / (lord + farmer)
+    if board.currentPlayer() == 1:
+        return score + 1
+    else:
+        return score - 1
+
+
+def approximateTurnsHeuristic(board):
+    return turnsHeuristic(board, approximate=True)
+
+
+HEURISTICS = {
+    'ranks': heuristic,
+    'turns': turnsHeuristic,
+    'approximate': approximateTurnsHeuristic,
+}
+
+
+# draft of entries stored by unlimited searches, deeper than any depth limit
+FULL_DEPTH = 1 << 10
+
+
+class MoveOrdering:
+    """
+    Orders the moves minmax tries at a node, each part a constructor option:
+    the move that empties the hand (finishing), the transposition table's
+    best move (table), the killer moves of the ply (killers, how many per
+    ply), then by history score (history) and by how many cards they get
+    rid of (largest).
+
+    Only the finishing move and the table move are on by default. On
+    landlord the killers and history of one line rarely refute the next,
+    and the largest plays first steer every side to long, bomb-heavy lines;
+    on main()'s deal each of them adds nodes to the table-only search, so
+    they are kept for experiments.
+
+    Moves are interned and the same for both sides, so killers and history
+    are kept per side to move; a pass is never recorded, it cuts off for
+    one side or the other nearly everywhere. History is halved and killers
+    dropped at the start of every search, see newSearch.
+    """
+    def __init__(self, finishing=True, table=True, killers=0, history=False, largest=False):
+        self.by_finishing = finishing
+        self.by_table = table
+        self.slots = killers
+        self.by_history = history
+        self.by_largest = largest
+        self.killers = {}
+        self.history = {}
+        self.cutoffs = 0
+        self.first_cutoffs = 0
+
+    def newSearch(self):
+        self.killers.clear()
+        for key in list(self.history):
+            score = self.history[key] >> 1
+            if score:
+                self.history[key] = score
+            else:
+                del self.history[key]
+
+    def order(self, board, moves, ply, ttMove=None):
+        player = board.currentPlayer()
+        if not self.by_finishing:
+            size = -1
+        elif player == 0:
+            size = len(board.playerA)
+        else:
+            size = len(board.playerB)
+        if not self.by_table:
+            ttMove = None
+        killers = self.killers.get((player, ply), ())
+        history = self.history
+        largest = self.by_largest
+
+        def rank(move):
+            return (len(move.cards) == size, move is ttMove, move in killers,
+                    history.get((player, move), 0), largest and len(move.cards))
+        return sorted(moves, key=rank, reverse=True)
+
+    def cutoff(self, player, move, ply, depth, index):
+        self.cutoffs += 1
+        if index == 0:
+            self.first_cutoffs += 1
+        if move.pattern == CardPattern.PASS:
+            return
+
+        if self.slots:
+            killers = self.killers.setdefault((player, ply), [])
+            if move not in killers:
+                killers.insert(0, move)
+                del killers[self.slots:]
+        if self.by_history:
+            key = (player, move)
+            self.history[key] = self.history.get(key, 0) + depth * depth
+
+    def clear(self):
+        self.killers.clear()
+        self.history.clear()
+        self.cutoffs = 0
+        self.first_cutoffs = 0
+
+    def stats(self):
+        return {
+            'cutoffs': self.cutoffs,
+            'first_move_cutoffs': self.first_cutoffs,
+            'first_move_rate': self.cutoffs and float(self.first_cutoffs) / self.cutoffs,
+        }
+
+
+def minmax(board, alpha, beta, table=None, ordering=None, ply=0, depth=None, budget=None, heuristic=heuristic,
+           tablebase=None, stats=None):
+    """
+    Alpha-beta search, scores are from player 1's point of view.
+
+    table is an optional transposition table (see transposition.newTable),
+    entries are drafted by the number of cards left and carry bound flags,
+    so scores cut off by alpha-beta are only reused as bounds.
+
+    ordering is an optional MoveOrdering, aged with newSearch() when ply is
+    0; without one moves are tried in generation order, after the table's
+    best move.
+
+    With depth set, unfinished games depth plies down are scored by
+    heuristic(board); budget is an optional deepening.Budget ticked per node.
+
+    tablebase is an optional landlord_tablebase.Tablebase, probed for exact
+    results whenever both hands are small enough to be in it.
+
+    stats is an optional stats.SearchStats counting nodes and cutoffs.
+    """
+    if budget is not None:
+        budget.tick()
+    if stats is not None:
+        stats.node(ply)
+    if ordering is not None and ply == 0:
+        ordering.newSearch()
+
     if board.isGameOver():
-        if not cache.get(hash(board), None):
-            cache[hash(board)] = (evaluate(board), None)
         return evaluate(board), None
 
-    if cache.get(hash(board), None):
-        return cache[hash(board)]
+    if tablebase is not None and max(len(board.playerA), len(board.playerB)) <= tablebase.max_cards:
+        entry = tablebase.probeBoard(board)
+        if entry is not None:
+            return entry
+
+    if depth == 0:
+        return heuristic(board), None
+
+    cards = len(board.playerA) + len(board.playerB)
+    draft = FULL_DEPTH + cards if depth is None else depth
+    ttMove = None
+    if table is not None:
+        key = board.key
+        alphaOrig, betaOrig = alpha, beta
+        value, ttMove = lookup(table, key, draft, alpha, beta)
+        if value is not None:
+            return value, ttMove
+
+    if MOVE_CACHE is None:
+        moves = lazyMoves(board, ordering, ply, ttMove)
+    else:
+        moves = board.getNextMoves()
+        if ordering is not None:
+            moves = ordering.order(board, moves, ply, ttMove)
+        elif ttMove in moves:
+            moves = [ttMove] + [move for move in moves if move is not ttMove]
 
     bestMove = None
     if board.currentPlayer() == 1:
@@ -348,9 +881,10 @@ def minmax(board, alpha, beta, cache = {}):
     else:
         bestScore = float('inf')
 
-    for move in board.getNextMoves():
+    for index, move in enumerate(moves):
         board.makeMove(move)
-        score, _ = minmax(board, alpha, beta)
+        score, _ = minmax(board, alpha, beta, table, ordering, ply + 1, depth and depth - 1, budget, heuristic,
+                          tablebase, stats)
         board.unmakeMove(move)
         if board.currentPlayer() == 1:
             if score > bestScore:
@@ -359,9 +893,6 @@ def minmax(board, alpha, beta, cache = {}):
 
             if score > alpha:
                 alpha = score
-
-            if alpha >= beta:
-                break
         else:
             if score < bestScore:
                 bestScore = score
@@ -370,26 +901,238 @@ def minmax(board, alpha, beta, cache = {}):
             if score < beta:
                 beta = score
 
-            if alpha >= beta:
-                break
+        if alpha >= beta:
+            if ordering is not None:
+                ordering.cutoff(board.currentPlayer(), move, ply, cards, index)
+            if stats is not None:
+                stats.cutoff(index == 0)
+            break
 
-    if not cache.get(hash(board), None):
-        cache[hash(board)] = (bestScore, bestMove)
+    if table is not None:
+        table.store(key, draft, boundFlag(bestScore, alphaOrig, betaOrig), bestScore, bestMove)
     return bestScore, bestMove
 
 
-def main():
-    board = Board()
+def deepeningMinmax(board, seconds=None, nodes=None, maxDepth=64, table=None, ordering=None, heuristic=heuristic,
+                    stats=None):
+    """
+    Iterative deepening over minmax within a wall clock and/or node budget,
+    stopping early once a win or loss is proven. The table carries each
+    iteration's best moves into the next one's ordering.
+
+    Returns (score, move, depth) of the deepest completed iteration; if not
+    even depth 1 completed, move is the first legal move.
+    """
+    budget = Budget(seconds, nodes)
+    if table is None:
+        table = newTable(1 << 16)
+    records = len(board.records)
+
+    def run(depth):
+        try:
+            return minmax(board, -float('inf'), float('inf'), table, ordering, 0, depth, budget, heuristic,
+                          stats=stats)
+        except SearchTimeout:
+            while len(board.records) > records:
+                board.unmakeMove(board.records[-1])
+            raise
+
+    score, move, depth = iterativeDeepening(run, maxDepth, solved=10)
+    if move is None and not board.isGameOver():
+        move = board.getNextMoves()[0]
+    return score, move, depth
+
+
+def searchRootMove(board, move, alpha, ordering=False):
+    """
+    Score of a root move for the side to move, see parallel.rootSplit. With
+    ordering, every worker keeps a MoveOrdering, aged once per root move.
+    """
+    state = workerState()
+    if ordering:
+        ordering = state.setdefault('ordering', MoveOrdering())
+        ordering.newSearch()
+    else:
+        ordering = None
+    player = board.currentPlayer()
+    board.makeMove(move)
+    if player == 1:
+        score, _ = minmax(board, alpha, float('inf'), state['table'], ordering, 1)
+        return score
+    else:
+        score, _ = minmax(board, -float('inf'), -alpha, state['table'], ordering, 1)
+        return -score
 
-    # farmer_cards = raw_input('input lord cards: ')
-    # board.playerA = Card.convert(farmer_cards.split())
-    # lord_cards = raw_input('input farmer cards: ')
-    # board.playerB = Card.convert(lord_cards.split())
 
-    board.playerA = Card.convert('Y A K K Q J 10 9 8 5 4'.split())
-    board.playerB = Card.convert('2 A K Q J 10 9 9 7 7 3'.split())
+def parallelMinmax(board, workers=None, tableSize=1 << 20, ordering=False):
+    """
+    Same result as minmax(board, -inf, inf), with the root moves searched in
+    parallel on a pool of worker processes, with a MoveOrdering each if
+    ordering is set. The move that empties the hand, else the first move,
+    is searched before the others, see parallel.rootSplit.
+    """
+    if board.isGameOver():
+        return evaluate(board), None
 
-    first_hand = True
+    moves = list(board.getNextMoves())
+    if board.current_player == 0:
+        finishing = finishingMove(board.playerA)
+    else:
+        finishing = finishingMove(board.playerB)
+    first = finishing in moves and moves.index(finishing) or 0
+    searchMove = ordering and partial(searchRootMove, ordering=True) or searchRootMove
+    score, move = rootSplit(searchMove, board, moves, workers, tableSize, first=first, best=10)
+    if board.currentPlayer() == 1:
+        return score, move
+    else:
+        return -score, move
+
+
+def solveDeal(lordHand, farmerHand, lastMove=None, table=None, ordering=None):
+    """
+    Solve one position with the lord to move, facing lastMove (a Move, a
+    list of cards or None to lead). Returns (score, bestMove, nodes, elapsed).
+    Raises ValueError when lastMove is not a valid play.
+    """
+    if lastMove is not None and not isinstance(lastMove, Move):
+        lastMove = Move(lastMove, *cardPattern(lastMove))
+    if lastMove is not None and lastMove.pattern in (None, CardPattern.INVALID):
+        raise ValueError('lord %s, farmer %s: last move %s is not a valid play' % (
+            Card.revert(sorted(lordHand)), Card.revert(sorted(farmerHand)), lastMove))
+    board = Board(lordHand, farmerHand, lastMove)
+    budget = Budget()
+    start = time.time()
+    score, move = minmax(board, -float('inf'), float('inf'), table, ordering, 0, None, budget)
+    return score, move, budget.nodes, time.time() - start
+
+
+def _solvePosition(position):
+    return solveDeal(*position, table=workerState()['table'])
+
+
+def solveDeals(positions, workers=None, chunksize=64, tableSize=1 << 20):
+    """
+    Solve an iterable of (lordHand, farmerHand, lastMove) positions, yielding
+    (score, bestMove, nodes, elapsed) for each in order as they are solved.
+
+    Positions are sent in chunks to worker processes (None: one per core)
+    that keep their transposition table warm across positions; workers=0
+    solves them in this process instead.
+    """
+    if workers == 0:
+        table = newTable(tableSize)
+        for position in positions:
+            yield solveDeal(*position, table=table)
+        return
+
+    for result in poolMap(_solvePosition, positions, workers, chunksize, tableSize):
+        yield result
+
+
+def winner(board):
+    """The player whose hand is empty, the one left on move at the end."""
+    return board.currentPlayer()
+
+
+def mctsScore(player, visits, wins):
+    """Score from player 1's point of view of a move player won wins of visits playouts with."""
+    score = 20.0 * wins / visits - 10
+    if player == 1:
+        return score
+    else:
+        return -score
+
+
+def mctsSearch(board, iterations=None, seconds=None, tree=None, seed=None):
+    """
+    Monte Carlo tree search, for hands too big to search exactly. Returns
+    (score, move): the most visited move and its playout win rate scaled to
+    -10..10 from player 1's point of view. Passing the same tree, an
+    mcts.MCTS, on every turn reuses what it learned about the position.
+    """
+    if tree is None:
+        tree = MCTS(winner, seed=seed)
+    move = tree.search(board, iterations, seconds)
+    if move is None:
+        return evaluate(board), None
+    for child, visits, wins in tree.rootStats():
+        if child is move:
+            return mctsScore(board.currentPlayer(), visits, wins), move
+
+
+def _mctsPlayouts(task):
+    board, iterations, seconds, seed = task
+    tree = MCTS(winner, seed=seed)
+    tree.search(board, iterations, seconds)
+    return tree.rootStats()
+
+
+def parallelMcts(board, workers=None, iterations=None, seconds=None, seed=None):
+    """
+    Root parallel mctsSearch: every worker process grows its own tree from
+    board with the whole budget and a seed of its own, and the visits and
+    wins of the root moves are summed over all trees.
+    """
+    if board.isGameOver():
+        return evaluate(board), None
+
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    seeds = [None if seed is None else seed + i for i in range(workers)]
+    visits, wins = OrderedDict(), {}
+    tasks = [(board, iterations, seconds, s) for s in seeds]
+    for stats in poolMap(_mctsPlayouts, tasks, workers, chunksize=1, tableSize=None):
+        for move, n, w in stats:
+            visits[move] = visits.get(move, 0) + n
+            wins[move] = wins.get(move, 0) + w
+
+    move = max(visits, key=visits.get)
+    return mctsScore(board.currentPlayer(), visits[move], wins[move]), move
+
+
+def proofNumberSearch(board, tableSize=1 << 20, nodes=None, stats=None):
+    """
+    Solve board with df-pn, which goes straight for the cheapest proof and
+    is much faster than minmax on lopsided deals. Returns (score, move,
+    size): the score from player 1's point of view, a winning move for the
+    side to move (the first move when it has none) and the number of
+    positions in the proof of the result. With nodes set, raises
+    SearchTimeout, the board as it was, when the search needs more.
+    """
+    if board.isGameOver():
+        return evaluate(board), None, 1
+
+    search = ProofNumberSearch(tableSize, nodes and Budget(nodes=nodes))
+    records = len(board.records)
+    try:
+        proof, _ = search.solve(board)
+        move = search.winningMove(board) or board.getNextMoves()[0]
+        size = search.proofSize(board)
+    except SearchTimeout:
+        while len(board.records) > records:
+            board.unmakeMove(board.records[-1])
+        raise
+    finally:
+        if stats is not None:
+            stats.nodes += search.nodes
+
+    won = proof == 0
+    if won == (board.currentPlayer() == 1):
+        return 10, move, size
+    else:
+        return -10, move, size
+
+
+def main(table=None, ordering=None, seconds=None, workers=None, tablebase=None, statsFile=None, mcts=False,
+         iterations=None, proof=False, heuristic=heuristic):
+    # farmer_cards = input('input lord cards: ')
+    # lord_cards = input('input farmer cards: ')
+    # board = Board(Card.convert(farmer_cards.split()), Card.convert(lord_cards.split()))
+
+    board = Board(Card.convert('Y A K K Q J 10 9 8 5 4'.split()),
+                  Card.convert('2 A K Q J 10 9 9 7 7 3'.split()))
+
+    tree = MCTS(winner)
     while True:
         if board.isGameOver():
             print(board)
@@ -397,25 +1140,75 @@ def main():
             break
         print(board)
 
-        cards_str = raw_input('please take your turn: ')
+        cards_str = input('please take your turn: ')
         if cards_str == 'q':
             print('quit..')
             break
 
-        your_cards = Card.convert(cards_str.split())
-        your_move = Move(your_cards)
-        your_move.parse()
-        if not first_hand and your_move not in board.getNextMoves():
+        your_move = legalMove(board, Card.convert(cards_str.split()))
+        if your_move is None:
             print('your cards is not valid!')
             continue
-        if first_hand:
-            first_hand = False
         board.makeMove(your_move)
 
-        _, move = minmax(board, -float('inf'), float('inf'))
+        stats = SearchStats('landlord')
+        stats.start(table)
+        if mcts and workers:
+            _, move = parallelMcts(board, workers, iterations, seconds)
+        elif mcts:
+            _, move = mctsSearch(board, iterations, seconds, tree)
+        elif proof:
+            _, move, size = proofNumberSearch(board, table is not None and table.size or 1 << 20, stats=stats)
+            print('proof size: %d' % size)
+        elif workers:
+            _, move = parallelMinmax(board, workers, ordering=ordering is not None)
+        elif seconds is None:
+            _, move = minmax(board, -float('inf'), float('inf'), table, ordering, tablebase=tablebase, stats=stats)
+        else:
+            _, move, _ = deepeningMinmax(board, seconds, table=table, ordering=ordering, heuristic=heuristic,
+                                         stats=stats)
+        stats.stop(table)
+        print(stats)
+        if statsFile is not None:
+            with open(statsFile, 'a') as f:
+                f.write(stats.toJson() + '\n')
         board.makeMove(move)
         print('your oppenonet\'s turn: %s' % move)
 
 
 if __name__ == '__main__':
-    main()
+    from optparse import OptionParser
+
+    parser = OptionParser()
+    parser.add_option('-t', '--tt-size', dest='tt_size', action='store', type='int', default=1 << 20, help='transposition table entries')
+    parser.add_option('-p', '--tt-policy', dest='tt_policy', action='store', default='depth', help='replacement policy: depth, always or lru')
+    parser.add_option('-O', '--ordering', dest='ordering', action='store_true', default=True, help='try the finishing move and the table move first, the default')
+    parser.add_option('-n', '--no-ordering', dest='ordering', action='store_false', help='search moves in generation order after the table move')
+    parser.add_option('-k', '--killers', dest='killers', action='store', type='int', default=0, help='killer moves per ply to try early, none by default')
+    parser.add_option('-H', '--history', dest='history', action='store_true', default=False, help='order the remaining moves by history score')
+    parser.add_option('-T', '--time', dest='seconds', action='store', type='float', default=None, help='seconds per move, search to the end if unset')
+    parser.add_option('-w', '--workers', dest='workers', action='store', type='int', default=0, help='search root moves on this many processes')
+    parser.add_option('-b', '--tablebase', dest='tablebase', action='store', default=None, help='endgame tablebase file')
+    parser.add_option('-m', '--mcts', dest='mcts', action='store_true', default=False, help='monte carlo tree search, within --time or --iterations')
+    parser.add_option('-i', '--iterations', dest='iterations', action='store', type='int', default=None, help='playouts per move for --mcts')
+    parser.add_option('-P', '--proof', dest='proof', action='store_true', default=False, help='solve with df-pn, in a table of --tt-size entries')
+    parser.add_option('-e', '--evaluator', dest='evaluator', action='store', default='ranks', help='leaf scores for --time: ranks, turns or approximate')
+    parser.add_option('-j', '--stats', dest='stats', action='store', default=None, help='append search statistics to this file as json lines')
+    opts, args = parser.parse_args()
+
+    table = newTable(opts.tt_size, opts.tt_policy)
+    ordering = opts.ordering and MoveOrdering(killers=opts.killers, history=opts.history) or None
+    tablebase = None
+    if opts.tablebase:
+        from landlord_tablebase import Tablebase
+        tablebase = Tablebase(opts.tablebase)
+    if opts.mcts and opts.seconds is None and opts.iterations is None:
+        parser.error('--mcts needs --time or --iterations')
+    if opts.evaluator not in HEURISTICS:
+        parser.error('unknown evaluator: %s' % opts.evaluator)
+    main(table, ordering, opts.seconds, opts.workers, tablebase, opts.stats, opts.mcts, opts.iterations, opts.proof,
+         HEURISTICS[opts.evaluator])
+    # only the serial searches order moves with it, workers keep their own
+    if ordering is not None and not (opts.mcts or opts.proof or opts.workers):
+        print('Ordering: %s' % ordering.stats())
+    table.clear()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Endgame tablebase for two-player landlord.
+
+build() solves every position where both sides hold at most max_cards cards
+and writes the exact results to a file: a header followed by fixed size
+records sorted by position key (Board.key). Tablebase opens such a file with
+mmap and answers probes by binary search over the keys, without loading or
+unpacking anything but the records it visits.
+
+A position facing a move is stored once for every set of replies the side
+to move has: probeKey() maps the move to beat to the representative of the
+positions that leave the same replies, see canonicalLast().
+"""
+
+import mmap
+import struct
+import zlib
+
+from landlord import Board, Card, CardPattern, Move, FULL_DEPTH, getNextMoves, lastMoveKey, minmax
+from transposition import LRUTable, EXACT
+
+
+MAGIC = b'LLTBASE\0'
+VERSION = 2
+
+# magic, version, record size, max cards, record count, crc32 of the records,
+# key of a reference position to catch files built with other zobrist keys
+HEADER = struct.Struct('<8sHHIQIQ')
+# key, score, move pattern, move value, move cards packed 3 bits per rank
+RECORD = struct.Struct('<QbbbQ')
+KEY = struct.Struct('<Q')
+
+# rank caps of a deck, Card.THREE to Card.RJOKER
+DECK = [4] * 13 + [1, 1]
+
+
+# pattern to beat that no hand in a tablebase can match, a plane of five
+# triples with kickers being 20 cards: stands for every move only bombs and
+# the rocket answer
+UNMATCHED = 31
+
+
+class TablebaseError(Exception):
+    pass
+
+
+def fingerprint():
+    board = Board([Card.THREE, Card.ACE, Card.ACE], [Card.RJOKER], Move([Card.FOUR]).parse())
+    board.current_player = 1
+    return board.rehash()
+
+
+def packCards(cards):
+    sig = 0
+    for card in cards:
+        sig += 1 << 3 * (card - Card.THREE)
+    return sig
+
+
+def unpackCards(sig):
+    return [Card.THREE + i for i in range(len(DECK)) for j in range((sig >> 3 * i) & 7)]
+
+
+def hands(maxCards, caps=DECK):
+    """Every hand of 1 to maxCards cards within caps, as count vectors."""
+    counts = [0] * len(caps)
+
+    def walk(index, left):
+        if index == len(caps):
+            if left < maxCards:
+                yield list(counts)
+            return
+        for count in range(min(caps[index], left) + 1):
+            counts[index] = count
+            for hand in walk(index + 1, left - count):
+                yield hand
+        counts[index] = 0
+
+    return walk(0, maxCards)
+
+
+def positions(maxCards):
+    """Every (lordCards, farmerCards) that can be dealt from one deck."""
+    for lord in hands(maxCards):
+        caps = [cap - count for cap, count in zip(DECK, lord)]
+        for farmer in hands(maxCards, caps):
+            yield unpackCards(sum(c << 3 * i for i, c in enumerate(lord))), \
+                unpackCards(sum(c << 3 * i for i, c in enumerate(farmer)))
+
+
+def replyValues(hand):
+    """{pattern: sorted values} of the moves hand can lead, but the rocket."""
+    values = {}
+    for move in getNextMoves(hand, CardPattern.PASS, -1):
+        if move.pattern != CardPattern.ROCKET:
+            values.setdefault(move.pattern, set()).add(move.value)
+    return dict((pattern, sorted(v)) for pattern, v in values.items())
+
+
+def canonicalLast(values, pattern, value):
+    """
+    (pattern, value) to beat that leaves a hand with replyValues values the
+    same replies as pattern and value do: the greatest of its own values of
+    that pattern not above value, -1 if none, or UNMATCHED when it has no
+    move of that pattern to beat it with but bombs.
+    """
+    if pattern in (CardPattern.PASS, CardPattern.ROCKET):
+        return pattern, value
+    own = values.get(pattern, ())
+    if pattern != CardPattern.BOMB and not any(v > value for v in own):
+        return UNMATCHED, -1
+    return pattern, max([v for v in own if v <= value] or [-1])
+
+
+def canonicalLasts(values):
+    """Every (pattern, value) canonicalLast gives for a hand with replyValues values."""
+    lasts = [(CardPattern.ROCKET, 100), (UNMATCHED, -1), (CardPattern.BOMB, -1)]
+    for pattern, own in values.items():
+        lasts.append((pattern, -1))
+        lasts.extend((pattern, v) for v in own[:-1])
+        if pattern == CardPattern.BOMB:
+            lasts.append((pattern, own[-1]))
+    return set(lasts)
+
+
+def probeKey(board):
+    """The key board is stored under, the same as board.key when it leads."""
+    last = board.records and board.records[-1] or None
+    if last is None or last.pattern == CardPattern.PASS:
+        return board.key
+    if board.currentPlayer() == 0:
+        hand = board.playerA
+    else:
+        hand = board.playerB
+    pattern, value = canonicalLast(replyValues(hand), last.pattern, last.value)
+    return board.key ^ lastMoveKey(last) ^ lastMoveKey(Move((), pattern, value))
+
+
+def build(path, maxCards, tableSize=1 << 20, verbose=False):
+    """
+    Solve every position with at most maxCards cards a side, either side to
+    lead or facing any move, and write them, along with the exact results
+    of positions met on the way that are still in the transposition table,
+    to path. Returns the number of records written.
+    """
+    if maxCards >= 20:
+        raise ValueError('tablebases hold at most 19 cards a side')
+    results = {}
+    table = LRUTable(tableSize)
+    for count, (lord, farmer) in enumerate(positions(maxCards)):
+        for player, cards in ((0, lord), (1, farmer)):
+            lasts = [None] + [Move((), pattern, value) for pattern, value in canonicalLasts(replyValues(cards))]
+            for last in lasts:
+                board = Board(lord, farmer, last)
+                board.current_player = player
+                board.key = board.rehash()
+                results[board.key] = minmax(board, -float('inf'), float('inf'), table)
+        if verbose and count % 10000 == 0:
+            print('%d positions solved' % count)
+
+    for key, draft, flag, value, move in table.items():
+        if flag == EXACT and draft >= FULL_DEPTH:
+            results[key] = (value, move)
+
+    records = b''.join(RECORD.pack(key, score, move.pattern, move.value, packCards(move.cards))
+                       for key, (score, move) in sorted(results.items()))
+    header = HEADER.pack(MAGIC, VERSION, RECORD.size, maxCards, len(results),
+                         zlib.crc32(records) & 0xffffffff, fingerprint())
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.write(records)
+    return len(results)
+
+
+class Tablebase:
+    """
+    Read-only, memory mapped tablebase; probe(key) returns (score, move) of
+    an exact result or None, probeBoard(board) the same for a board.
+    verify=False skips the checksum of the records, which has to read the
+    whole file.
+    """
+    def __init__(self, path, verify=True):
+        self.file = open(path, 'rb')
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise TablebaseError('%s: empty file' % path)
+
+        if len(self.data) < HEADER.size:
+            self.close()
+            raise TablebaseError('%s: truncated header' % path)
+        magic, version, size, self.max_cards, self.count, crc, key = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            self.close()
+            raise TablebaseError('%s: not a landlord tablebase' % path)
+        if version != VERSION or size != RECORD.size:
+            self.close()
+            raise TablebaseError('%s: unsupported version %d' % (path, version))
+        if key != fingerprint():
+            self.close()
+            raise TablebaseError('%s: built with different position keys' % path)
+        if len(self.data) != HEADER.size + self.count * RECORD.size:
+            self.close()
+            raise TablebaseError('%s: truncated records' % path)
+        if verify and self.checksum() != crc:
+            self.close()
+            raise TablebaseError('%s: checksum mismatch' % path)
+
+    def __len__(self):
+        return self.count
+
+    def checksum(self):
+        """crc32 of the records, read straight from the mapping without copying it."""
+        with memoryview(self.data) as view, view[HEADER.size:] as records:
+            return zlib.crc32(records) & 0xffffffff
+
+    def probe(self, key):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = HEADER.size + mid * RECORD.size
+            found = KEY.unpack_from(self.data, offset)[0]
+            if found < key:
+                lo = mid + 1
+            elif found > key:
+                hi = mid
+            else:
+                _, score, pattern, value, cards = RECORD.unpack_from(self.data, offset)
+                return score, Move(unpackCards(cards), pattern, value)
+        return None
+
+    def probeBoard(self, board):
+        return self.probe(probeKey(board))
+
+    def close(self):
+        if getattr(self, 'data', None) is not None:
+            self.data.close()
+            self.data = None
+        self.file.close()
+
+
+if __name__ == '__main__':
+    from optparse import OptionParser
+
+    parser = OptionParser(usage='%prog [options] FILE')
+    parser.add_option('-n', '--cards', dest='cards', action='store', type='int', default=2, help='max cards per side')
+    parser.add_option('-t', '--tt-size', dest='tt_size', action='store', type='int', default=1 << 20, help='transposition table entries')
+    opts, args = parser.parse_args()
+
+    if len(args) != 1:
+        parser.error('missing tablebase file')
+    print('%d records written' % build(args[0], opts.cards, opts.tt_size, verbose=True))
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Monte Carlo tree search (UCT) over boards with the landlord interface:
+isGameOver(), currentPlayer(), getNextMoves(), makeMove(move),
+unmakeMove(move) and an incrementally updated key.
+"""
+
+import math
+import random
+import time
+
+
+class Node(object):
+    __slots__ = ('move', 'player', 'key', 'parent', 'children', 'untried', 'visits', 'wins')
+
+    def __init__(self, move=None, player=None, key=None, parent=None):
+        # move is the one that led here, played by player
+        self.move = move
+        self.player = player
+        self.key = key
+        self.parent = parent
+        self.children = []
+        # moves not expanded yet, filled on the first visit
+        self.untried = None
+        self.visits = 0
+        self.wins = 0
+
+    def select(self, exploration):
+        log = math.log(self.visits)
+        best, bestValue = None, -1.0
+        for child in self.children:
+            value = float(child.wins) / child.visits + exploration * math.sqrt(log / child.visits)
+            if value > bestValue:
+                best, bestValue = child, value
+        return best
+
+
+class MCTS:
+    """
+    UCT search with uniformly random playouts. winner(board) names the
+    winner of a finished game. The tree is kept between calls to search():
+    when the board is the root or one or two moves below it, the search
+    carries on from what is already known about that position.
+    """
+    def __init__(self, winner, exploration=math.sqrt(2), seed=None):
+        self.winner = winner
+        self.exploration = exploration
+        self.random = random.Random(seed)
+        self.root = None
+        self.playouts = 0
+
+    def reuse(self, board):
+        if self.root is not None:
+            if self.root.key == board.key:
+                return self.root
+            for child in self.root.children:
+                if child.key == board.key:
+                    child.parent = None
+                    return child
+                for grandchild in child.children:
+                    if grandchild.key == board.key:
+                        grandchild.parent = None
+                        return grandchild
+        return Node(key=board.key)
+
+    def search(self, board, iterations=None, seconds=None):
+        """
+        Run playouts from board until iterations of them are done or seconds
+        have passed (one of the two must be set); returns the most visited
+        move, None if the game is over.
+        """
+        if iterations is None and seconds is None:
+            raise ValueError('mcts needs an iteration or time budget')
+        self.root = self.reuse(board)
+        if board.isGameOver():
+            return None
+
+        deadline = seconds is not None and time.time() + seconds
+        done = 0
+        while iterations is None or done < iterations:
+            if deadline and time.time() > deadline:
+                break
+            self.playout(board)
+            done += 1
+        self.playouts += done
+        return self.bestMove()
+
+    def playout(self, board):
+        node = self.root
+        played = []
+
+        # selection, down to a node that still has moves to expand
+        while node.untried is not None and not node.untried and node.children:
+            node = node.select(self.exploration)
+            board.makeMove(node.move)
+            played.append(node.move)
+
+        # expansion
+        if node.untried is None:
+            node.untried = [] if board.isGameOver() else list(board.getNextMoves())
+            self.random.shuffle(node.untried)
+        if node.untried:
+            move = node.untried.pop()
+            player = board.currentPlayer()
+            board.makeMove(move)
+            played.append(move)
+            child = Node(move, player, board.key, node)
+            node.children.append(child)
+            node = child
+
+        # simulation
+        choice = self.random.choice
+        while not board.isGameOver():
+            move = choice(board.getNextMoves())
+            board.makeMove(move)
+            played.append(move)
+        winner = self.winner(board)
+        for move in reversed(played):
+            board.unmakeMove(move)
+
+        # backpropagation
+        while node is not None:
+            node.visits += 1
+            if node.player == winner:
+                node.wins += 1
+            node = node.parent
+
+    def bestMove(self):
+        if not self.root.children:
+            return None
+        return max(self.root.children, key=lambda child: child.visits).move
+
+    def rootStats(self):
+        """(move, visits, wins) of every expanded root move."""
+        return [(child.move, child.visits, child.wins) for child in self.root.children]
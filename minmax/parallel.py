@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import multiprocessing
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+
+# per worker process: the shared root bound, a warm transposition table and
+# whatever else the game's searchMove wants to keep between tasks
+_worker = {}
+
+# SharedTable words: the key's upper 62 bits and whether it is won or lost
+_KEY_MASK = (1 << 64) - 4
+_WON = 1
+_LOST = 2
+# draft of shared entries, a decided position needs no deeper search
+_DECIDED = 1 << 30
+
+
+class SharedTable(TranspositionTable):
+    """
+    A worker's transposition table, backed by a table shared between all
+    workers of the positions that are decided: proven to score best or
+    -best when no score lies beyond those, a win or a loss.
+
+    Every shared slot is one 64-bit word of words (a multiprocessing
+    RawArray), the key with its two low bits replaced by the result, so
+    workers read and write it without a lock: a word is either a whole
+    entry of some key or empty, never half of one.
+    """
+    def __init__(self, words, best, size=1 << 16):
+        TranspositionTable.__init__(self, size)
+        self.words = words
+        self.best = best
+
+    def probe(self, key):
+        entry = TranspositionTable.probe(self, key)
+        if entry is not None and entry[1] == _DECIDED:
+            return entry
+        word = self.words[key % len(self.words)]
+        if not word or word & _KEY_MASK != key & _KEY_MASK:
+            return entry
+        value = word & 3 == _WON and self.best or -self.best
+        return (key, _DECIDED, EXACT, value, entry and entry[4])
+
+    def store(self, key, depth, flag, value, move=None):
+        if value >= self.best and flag != UPPER:
+            result = _WON
+        elif value <= -self.best and flag != LOWER:
+            result = _LOST
+        else:
+            TranspositionTable.store(self, key, depth, flag, value, move)
+            return
+        TranspositionTable.store(self, key, _DECIDED, EXACT, value, move)
+        self.words[key % len(self.words)] = key & _KEY_MASK | result
+
+
+def _initWorker(bound, tableSize, words=None, best=None):
+    _worker.clear()
+    _worker['bound'] = bound
+    if tableSize is None:
+        return
+    if words is None:
+        _worker['table'] = TranspositionTable(tableSize)
+    else:
+        _worker['table'] = SharedTable(words, best, tableSize)
+
+
+def workerState():
+    return _worker
+
+
+def _searchRootMove(searchMove, board, move, margin):
+    bound = _worker['bound']
+    alpha = bound.value - margin
+    score = searchMove(board, move, alpha)
+    if score > alpha:
+        with bound.get_lock():
+            if score > bound.value:
+                bound.value = score
+    return score, score > alpha
+
+
+def _mapChunk(func, chunk):
+    return [func(item) for item in chunk]
+
+
+def poolMap(func, items, workers=None, chunksize=64, tableSize=1 << 16):
+    """
+    Lazily map func over items on a pool of worker processes, sent out in
+    chunks of chunksize; yields the results in order. Only two chunks per
+    worker are taken from items and in flight at a time, so neither items
+    nor unread results pile up in memory. Every worker keeps one
+    transposition table, workerState()['table'], warm across all its items,
+    unless tableSize is None.
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    items = iter(items)
+    pending = deque()
+    pool = multiprocessing.Pool(workers, _initWorker, (None, tableSize))
+    try:
+        while True:
+            while len(pending) < 2 * workers:
+                chunk = list(islice(items, chunksize))
+                if not chunk:
+                    break
+                pending.append(pool.apply_async(_mapChunk, (func, chunk)))
+            if not pending:
+                break
+            for result in pending.popleft().get():
+                yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def rootSplit(searchMove, board, moves, workers=None, tableSize=1 << 16, margin=1, first=0, best=None):
+    """
+    Young Brothers Wait split of the root on a pool of worker processes:
+    moves[first] is searched alone, then every other move as its own task.
+
+    searchMove(board, move, alpha) must be a module level function returning
+    the score of move for the side to move at the root, searched with alpha
+    as the lower bound of the window; the best score found so far is shared
+    between workers and handed out as that alpha, so searching one move
+    first sets it before the rest start and they only have to be refuted.
+    The moves ahead of moves[first] get it less margin, and so does any move
+    that failed low at the best score ahead of the move that reached it,
+    searched again at the end. With scores that are multiples of margin,
+    the result matches the serial search: the best score and the first
+    move, in the given order, that reaches it.
+
+    best is the highest score there is, if known, and -best the lowest; once
+    moves[first] reaches it, the moves after it cannot change the result and
+    are not searched. With best, the workers also share the positions they
+    prove won or lost, see SharedTable, as their root moves mostly lead to
+    the same positions.
+    """
+    bound = multiprocessing.Value('d', -float('inf'))
+    words = best is not None and multiprocessing.RawArray('Q', tableSize) or None
+    pool = ProcessPoolExecutor(workers, initializer=_initWorker, initargs=(bound, tableSize, words, best))
+    try:
+        results = [None] * len(moves)
+        results[first] = pool.submit(_searchRootMove, searchMove, board, moves[first], 0).result()
+        if best is not None and results[first][0] >= best:
+            del results[first + 1:]
+        futures = [(i, pool.submit(_searchRootMove, searchMove, board, moves[i], i < first and margin or 0))
+                   for i in range(len(results)) if i != first]
+        for i, future in futures:
+            results[i] = future.result()
+
+        score = max(value for value, exact in results)
+        for i, (value, exact) in enumerate(results):
+            if value == score and not exact and (best is None or value > -best):
+                value, exact = pool.submit(_searchRootMove, searchMove, board, moves[i], margin).result()
+            if value == score:
+                break
+    finally:
+        pool.shutdown()
+
+    return score, moves[i]
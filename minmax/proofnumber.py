@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Depth-first proof-number search (df-pn) for games that are won by the
+player who moves last, over boards with the landlord interface:
+isGameOver(), getNextMoves(), makeMove(move), unmakeMove(move) and an
+incrementally updated key. Games must not repeat positions.
+"""
+
+from transposition import LRUCache
+
+INF = 1 << 40
+
+
+class ProofTable(LRUCache):
+    """
+    (proof, disproof) numbers by position key, from the point of view of the
+    side to move, for at most size positions; the least recently used one
+    is dropped when full, to be searched again if needed.
+    """
+    def __init__(self, size=1 << 20):
+        LRUCache.__init__(self, size)
+
+    def store(self, key, proof, disproof):
+        self.put(key, (proof, disproof))
+
+
+class ProofNumberSearch:
+    """
+    df-pn in its negamax form: the proof number of a position is the least
+    disproof number of its children, its disproof number the sum of their
+    proof numbers, and the search always goes down the child that is the
+    cheapest to disprove, within thresholds that tell it when to come back.
+
+    budget is an optional deepening.Budget ticked per node.
+    """
+    def __init__(self, tableSize=1 << 20, budget=None):
+        self.table = ProofTable(tableSize)
+        self.budget = budget
+        self.nodes = 0
+
+    def children(self, board):
+        """[(move, key)] of board, or None if some move ends the game."""
+        children = []
+        for move in board.getNextMoves():
+            board.makeMove(move)
+            over, key = board.isGameOver(), board.key
+            board.unmakeMove(move)
+            if over:
+                return None
+            children.append((move, key))
+        return children
+
+    def numbers(self, key):
+        return self.table.get(key) or (1, 1)
+
+    def mid(self, board, proofLimit, disproofLimit):
+        """Search board until its proof or disproof number reaches its limit."""
+        if self.budget is not None:
+            self.budget.tick()
+        self.nodes += 1
+
+        key = board.key
+        children = self.children(board)
+        if children is None:
+            self.table.store(key, 0, INF)
+            return
+
+        while True:
+            disproof = 0
+            best, bestDisproof, second = None, INF, INF
+            for move, child in children:
+                childProof, childDisproof = self.numbers(child)
+                disproof = min(disproof + childProof, INF)
+                if childDisproof < bestDisproof:
+                    best, second, bestDisproof = (move, childProof), bestDisproof, childDisproof
+                elif childDisproof < second:
+                    second = childDisproof
+            proof = bestDisproof
+
+            if proof >= proofLimit or disproof >= disproofLimit:
+                self.table.store(key, proof, disproof)
+                return
+
+            move, childProof = best
+            board.makeMove(move)
+            self.mid(board, min(disproofLimit - disproof + childProof, INF), min(proofLimit, second + 1))
+            board.unmakeMove(move)
+
+    def solve(self, board):
+        """(proof, disproof) of board searched to the end: (0, INF) won, (INF, 0) lost."""
+        entry = self.table.get(board.key)
+        if entry is None or (entry[0] and entry[1]):
+            self.mid(board, INF, INF)
+            entry = self.table.get(board.key)
+        return entry
+
+    def winningMove(self, board):
+        """A move that wins for the side to move, None if there is none."""
+        if self.solve(board)[0]:
+            return None
+        for move in board.getNextMoves():
+            board.makeMove(move)
+            won = board.isGameOver() or self.solve(board)[1] == 0
+            board.unmakeMove(move)
+            if won:
+                return move
+
+    def proofSize(self, board, seen=None):
+        """
+        Positions in the proof that the side to move wins, or loses: one
+        winning move where it wins, every move where it loses, counting
+        positions reached in more than one way once.
+        """
+        if seen is None:
+            seen = set()
+        if board.key in seen:
+            return 0
+        seen.add(board.key)
+        if board.isGameOver():
+            return 1
+
+        if self.solve(board)[0] == 0:
+            moves = [self.winningMove(board)]
+        else:
+            moves = board.getNextMoves()
+        size = 1
+        for move in moves:
+            board.makeMove(move)
+            size += self.proofSize(board, seen)
+            board.unmakeMove(move)
+        return size
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import json
+import time
+
+
+class SearchStats:
+    """
+    Counters of one search. Searchers take it as an optional stats argument
+    and call node(ply) once per node and cutoff(first) on every beta cutoff;
+    start(table) and stop(table) around the search time it and take the
+    table's probes and hits. Without stats the searchers do none of this.
+    """
+    def __init__(self, name=None):
+        self.name = name
+        self.nodes = 0
+        self.max_depth = 0
+        self.cutoffs_first = 0
+        self.cutoffs_later = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.elapsed = 0.0
+        self._start = None
+        self._table = (0, 0)
+
+    def node(self, ply):
+        self.nodes += 1
+        if ply > self.max_depth:
+            self.max_depth = ply
+
+    def cutoff(self, first):
+        if first:
+            self.cutoffs_first += 1
+        else:
+            self.cutoffs_later += 1
+
+    def start(self, table=None):
+        if table is not None:
+            self._table = (table.hits, table.misses)
+        self._start = time.time()
+
+    def stop(self, table=None):
+        self.elapsed += time.time() - self._start
+        if table is not None:
+            hits, misses = self._table
+            self.tt_hits += table.hits - hits
+            self.tt_probes += table.hits + table.misses - hits - misses
+
+    def nps(self):
+        if not self.elapsed:
+            return 0.0
+        return self.nodes / self.elapsed
+
+    def branching(self):
+        """Effective branching factor, nodes ** (1 / max depth)."""
+        if not self.max_depth:
+            return 0.0
+        return self.nodes ** (1.0 / self.max_depth)
+
+    def toDict(self):
+        cutoffs = self.cutoffs_first + self.cutoffs_later
+        return {
+            'name': self.name,
+            'nodes': self.nodes,
+            'elapsed': self.elapsed,
+            'nps': self.nps(),
+            'branching': self.branching(),
+            'max_depth': self.max_depth,
+            'cutoffs': cutoffs,
+            'cutoffs_first': self.cutoffs_first,
+            'cutoffs_later': self.cutoffs_later,
+            'first_cutoff_rate': float(self.cutoffs_first) / cutoffs if cutoffs else 0.0,
+            'tt_probes': self.tt_probes,
+            'tt_hits': self.tt_hits,
+        }
+
+    def toJson(self):
+        return json.dumps(self.toDict(), sort_keys=True)
+
+    def __str__(self):
+        return ('nodes %d in %.3fs (%.0f/s), depth %d, branching %.2f, cutoffs %d first / %d later, '
+                'tt %d/%d hits' % (self.nodes, self.elapsed, self.nps(), self.max_depth, self.branching(),
+                                   self.cutoffs_first, self.cutoffs_later, self.tt_hits, self.tt_probes))
@@ -1,9 +1,28 @@
 #!/usr/bin/env python
 # encoding: utf-8
 
-import time
 import random
 import copy
+from array import array
+
+from transposition import TranspositionTable, lookup, boundFlag
+from deepening import Budget, iterativeDeepening
+from parallel import rootSplit, workerState
+from stats import SearchStats
+
+
+_ZOBRIST_KEYS = {}
+
+
+def zobristKeys(size):
+    """
+    Random 64-bit keys per (player, cell); a position's key is the xor of the
+    keys of its stones. Seeded by size so keys are the same in every run.
+    """
+    if size not in _ZOBRIST_KEYS:
+        rand = random.Random(size)
+        _ZOBRIST_KEYS[size] = [[rand.getrandbits(64) for cell in range(size * size)] for player in range(2)]
+    return _ZOBRIST_KEYS[size]
 
 
 class Board:
@@ -13,6 +32,9 @@ class Board:
         self.game_over = False
         self.current_player = 0
         self.board = [[0 for i in range(size)] for j in range(size)]
+        self.empty = size * size
+        self.zobrist = zobristKeys(size)
+        self.key = 0
 
     def __str__(self):
         disp = lambda i: {-1: 'o', 0: '-', 1: 'x'}.get(i, '-')
@@ -81,6 +103,8 @@ class Board:
             return False
 
         self.board[move[0]][move[1]] = self.markers[player]
+        self.empty -= 1
+        self.key ^= self.zobrist[player][move[0] * self.cubsize + move[1]]
 
         if self.chkGameOver():
             self.game_over = True
@@ -89,9 +113,427 @@ class Board:
 
         return True
 
+    def unmakeMove(self, move):
+        marker = self.board[move[0]][move[1]]
+        self.board[move[0]][move[1]] = 0
+        self.empty += 1
+        self.current_player = self.markers.index(marker)
+        self.game_over = False
+        self.key ^= self.zobrist[self.current_player][move[0] * self.cubsize + move[1]]
+
     def copyBoard(self):
         return copy.deepcopy(self)
 
+    def toList(self):
+        return [list(row) for row in self.board]
+
+    def stoneMasks(self):
+        stones = [0, 0]
+        for i in range(self.cubsize):
+            for j in range(self.cubsize):
+                if self.board[i][j]:
+                    stones[self.markers.index(self.board[i][j])] |= 1 << (i * self.cubsize + j)
+        return stones
+
+    def evaluate(self, player):
+        if not self.game_over or self.current_player is None:
+            return 0
+
+        if self.current_player == player:
+            return 10
+        else:
+            return -10
+
+
+_LINES = {}
+_LINE_MASKS = {}
+
+
+def lineMasks(size):
+    """
+    Bit masks of every winning line (rows, columns and both diagonals) that
+    passes through each cell, cell (i, j) being bit i * size + j.
+    """
+    if size in _LINE_MASKS:
+        return _LINE_MASKS[size]
+
+    lines = []
+    for i in range(size):
+        lines.append(sum(1 << (i * size + j) for j in range(size)))
+        lines.append(sum(1 << (j * size + i) for j in range(size)))
+    lines.append(sum(1 << (i * size + i) for i in range(size)))
+    lines.append(sum(1 << (i * size + size - 1 - i) for i in range(size)))
+
+    masks = [[line for line in lines if line >> cell & 1] for cell in range(size * size)]
+    _LINES[size] = lines
+    _LINE_MASKS[size] = masks
+    return masks
+
+
+def heuristic(board, player):
+    """
+    Static score of an unfinished game for depth-limited search: every line
+    still open to one player counts its stones for that player. Scaled to
+    stay strictly between the -10/10 of a lost/won game.
+    """
+    if isinstance(board, GomokuBoard):
+        return board.heuristic(player)
+    size = board.cubsize
+    lineMasks(size)
+    lines = _LINES[size]
+    stones = board.stoneMasks()
+    mine, theirs = stones[player], stones[1 - player]
+
+    score = 0
+    for line in lines:
+        if not line & theirs:
+            score += bin(line & mine).count('1')
+        if not line & mine:
+            score -= bin(line & theirs).count('1')
+    return 9.0 * score / (len(lines) * size)
+
+
+class BitBoard:
+    """
+    Same interface as Board, but every player's stones are kept as an integer
+    bit mask, so a move only has to test the lines through the placed stone.
+    """
+    def __init__(self, size=3):
+        self.cubsize = size
+        self.markers = [1, -1]
+        self.game_over = False
+        self.current_player = 0
+        self.stones = [0, 0]
+        self.empty = size * size
+        self.lines = lineMasks(size)
+        self.zobrist = zobristKeys(size)
+        self.key = 0
+        self.cells = [(i, j) for i in range(size) for j in range(size)]
+        # the position under every symmetry, kept up to date for canonical()
+        self.images = [0] * 8
+        self.image_bits = imageBits(size)
+
+    def __str__(self):
+        disp = lambda i: {-1: 'o', 0: '-', 1: 'x'}.get(i, '-')
+        return '\n'.join(['\t'.join(map(disp, i)) for i in self.toList()])
+
+    def toList(self):
+        size = self.cubsize
+        board = [[0 for i in range(size)] for j in range(size)]
+        for player in range(2):
+            for cell in range(size * size):
+                if self.stones[player] >> cell & 1:
+                    board[cell // size][cell % size] = self.markers[player]
+        return board
+
+    def isGameOver(self):
+        return self.game_over
+
+    def currentPlayer(self):
+        return self.current_player
+
+    def chkGameOver(self, cell=None):
+        if cell is None:
+            lines = set(line for masks in self.lines for line in masks)
+            stones = self.stones
+        else:
+            lines = self.lines[cell]
+            stones = [self.stones[self.current_player]]
+        for line in lines:
+            for s in stones:
+                if s & line == line:
+                    return True
+
+        if self.empty == 0:
+            self.current_player = None
+            return True
+
+        return False
+
+    def getMoves(self):
+        occupied = self.stones[0] | self.stones[1]
+        return [self.cells[i] for i in range(self.cubsize * self.cubsize) if not occupied >> i & 1]
+
+    def makeMove(self, player, move):
+        if not move:
+            return False
+
+        if move[0] >= self.cubsize or move[1] >= self.cubsize:
+            return False
+
+        if self.currentPlayer() != player:
+            print('it is not your turn!')
+            return False
+
+        cell = move[0] * self.cubsize + move[1]
+        if (self.stones[0] | self.stones[1]) >> cell & 1:
+            print('it is occupied!')
+            return False
+
+        self.stones[player] |= 1 << cell
+        self.empty -= 1
+        self.key ^= self.zobrist[player][cell]
+        self.images = [image ^ bit for image, bit in zip(self.images, self.image_bits[player][cell])]
+
+        if self.chkGameOver(cell):
+            self.game_over = True
+        else:
+            self.current_player = (self.current_player + 1) % 2
+
+        return True
+
+    def unmakeMove(self, move):
+        cell = move[0] * self.cubsize + move[1]
+        player = 0 if self.stones[0] >> cell & 1 else 1
+        self.stones[player] &= ~(1 << cell)
+        self.empty += 1
+        self.key ^= self.zobrist[player][cell]
+        self.images = [image ^ bit for image, bit in zip(self.images, self.image_bits[player][cell])]
+        self.current_player = player
+        self.game_over = False
+
+    def copyBoard(self):
+        board = copy.copy(self)
+        board.stones = list(self.stones)
+        board.images = list(self.images)
+        return board
+
+    def stoneMasks(self):
+        return list(self.stones)
+
+    def evaluate(self, player):
+        if not self.game_over or self.current_player is None:
+            return 0
+
+        if self.current_player == player:
+            return 10
+        else:
+            return -10
+
+
+_DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+_RAYS = {}
+_NEIGHBOURS = {}
+
+
+def rays(size, length):
+    """
+    [cell][direction]: the two rays of up to length cells leading away from
+    cell along the direction, forwards and backwards, nearest cell first.
+    """
+    index = (size, length)
+    if index not in _RAYS:
+        table = []
+        for i in range(size):
+            for j in range(size):
+                cell = []
+                for di, dj in _DIRECTIONS:
+                    pair = []
+                    for sign in (1, -1):
+                        ray = []
+                        for step in range(1, length + 1):
+                            r, c = i + sign * step * di, j + sign * step * dj
+                            if not (0 <= r < size and 0 <= c < size):
+                                break
+                            ray.append(r * size + c)
+                        pair.append(ray)
+                    cell.append(pair)
+                table.append(cell)
+        _RAYS[index] = table
+    return _RAYS[index]
+
+
+def neighbours(size, radius):
+    """[cell]: the other cells at most radius rows and columns away."""
+    index = (size, radius)
+    if index not in _NEIGHBOURS:
+        _NEIGHBOURS[index] = [[r * size + c
+                               for r in range(max(0, i - radius), min(size, i + radius + 1))
+                               for c in range(max(0, j - radius), min(size, j + radius + 1))
+                               if (r, c) != (i, j)]
+                              for i in range(size) for j in range(size)]
+    return _NEIGHBOURS[index]
+
+
+# threat score of a cell per direction by (stones short of k, open ends) of
+# the run a stone there would make: open fours and threes are worth most
+FIVE = 1 << 20
+THREATS = {
+    (1, 2): 1 << 16, (1, 1): 1 << 12,
+    (2, 2): 1 << 12, (2, 1): 1 << 8,
+    (3, 2): 1 << 6, (3, 1): 1 << 3,
+}
+
+
+class GomokuBoard:
+    """
+    k in a row on a size x size board, same interface as Board. A move only
+    checks the lines through its own stone, and getMoves() only offers empty
+    cells within radius of a stone, best threat first; a win on the spot
+    is the only move offered, as are the blocks when the opponent threatens one.
+
+    The threat score of a cell, what a stone of a player there would make,
+    is cached per player and recomputed only for the cells on the lines
+    through a stone that was placed or taken back.
+    """
+    def __init__(self, size=15, k=5, radius=2):
+        self.cubsize = size
+        self.k = k
+        self.markers = [1, -1]
+        self.game_over = False
+        self.current_player = 0
+        self.cells = size * size
+        self.grid = [0] * self.cells
+        self.stones = [0, 0]
+        self.empty = self.cells
+        self.zobrist = zobristKeys(size)
+        self.key = 0
+        self.rays = rays(size, k)
+        self.neighbours = neighbours(size, radius)
+        # stones within radius of every cell, and the empty cells with any
+        self.near = [0] * self.cells
+        self.candidates = set()
+        self.threats = [[None] * self.cells, [None] * self.cells]
+
+    def __str__(self):
+        disp = lambda i: {-1: 'o', 0: '-', 1: 'x'}.get(i, '-')
+        return '\n'.join(['\t'.join(map(disp, i)) for i in self.toList()])
+
+    def toList(self):
+        size = self.cubsize
+        return [self.grid[i * size:(i + 1) * size] for i in range(size)]
+
+    def isGameOver(self):
+        return self.game_over
+
+    def currentPlayer(self):
+        return self.current_player
+
+    def run(self, cell, marker, direction):
+        """(stones in the run of marker through cell, open ends of that run)."""
+        grid = self.grid
+        count, ends = 1, 0
+        for ray in self.rays[cell][direction]:
+            for other in ray:
+                if grid[other] != marker:
+                    if grid[other] == 0:
+                        ends += 1
+                    break
+                count += 1
+        return count, ends
+
+    def threat(self, player, cell):
+        score = self.threats[player][cell]
+        if score is None:
+            marker = self.markers[player]
+            score = 0
+            for direction in range(4):
+                count, ends = self.run(cell, marker, direction)
+                if count >= self.k:
+                    score += FIVE
+                elif ends:
+                    score += THREATS.get((self.k - count, ends), ends)
+            self.threats[player][cell] = score
+        return score
+
+    def getMoves(self):
+        size = self.cubsize
+        if not self.candidates:
+            if self.empty == self.cells:
+                return [(size // 2, size // 2)]
+            return [(cell // size, cell % size) for cell in range(self.cells) if not self.grid[cell]]
+
+        player = self.current_player
+        mine = dict((cell, self.threat(player, cell)) for cell in self.candidates)
+        theirs = dict((cell, self.threat(1 - player, cell)) for cell in self.candidates)
+        cells = [cell for cell in mine if mine[cell] >= FIVE]
+        if not cells:
+            cells = [cell for cell in theirs if theirs[cell] >= FIVE]
+        if cells:
+            return [(cell // size, cell % size) for cell in sorted(cells)]
+        cells = sorted(self.candidates, key=lambda cell: (-mine[cell] - theirs[cell], cell))
+        return [(cell // size, cell % size) for cell in cells]
+
+    def touch(self, cell):
+        threats = self.threats
+        threats[0][cell] = threats[1][cell] = None
+        for pair in self.rays[cell]:
+            for ray in pair:
+                for other in ray:
+                    threats[0][other] = threats[1][other] = None
+
+    def makeMove(self, player, move):
+        if not move:
+            return False
+
+        if move[0] >= self.cubsize or move[1] >= self.cubsize:
+            return False
+
+        if self.currentPlayer() != player:
+            print('it is not your turn!')
+            return False
+
+        cell = move[0] * self.cubsize + move[1]
+        if self.grid[cell]:
+            print('it is occupied!')
+            return False
+
+        self.grid[cell] = self.markers[player]
+        self.stones[player] |= 1 << cell
+        self.empty -= 1
+        self.key ^= self.zobrist[player][cell]
+        self.candidates.discard(cell)
+        for other in self.neighbours[cell]:
+            self.near[other] += 1
+            if not self.grid[other]:
+                self.candidates.add(other)
+        self.touch(cell)
+
+        if any(self.run(cell, self.markers[player], direction)[0] >= self.k for direction in range(4)):
+            self.game_over = True
+        elif self.empty == 0:
+            self.game_over = True
+            self.current_player = None
+        else:
+            self.current_player = (self.current_player + 1) % 2
+
+        return True
+
+    def unmakeMove(self, move):
+        cell = move[0] * self.cubsize + move[1]
+        player = self.markers.index(self.grid[cell])
+        self.grid[cell] = 0
+        self.stones[player] &= ~(1 << cell)
+        self.empty += 1
+        self.key ^= self.zobrist[player][cell]
+        for other in self.neighbours[cell]:
+            self.near[other] -= 1
+            if not self.near[other]:
+                self.candidates.discard(other)
+        if self.near[cell]:
+            self.candidates.add(cell)
+        self.touch(cell)
+        self.current_player = player
+        self.game_over = False
+
+    def copyBoard(self):
+        board = copy.copy(self)
+        board.grid = list(self.grid)
+        board.stones = list(self.stones)
+        board.near = list(self.near)
+        board.candidates = set(self.candidates)
+        board.threats = [list(self.threats[0]), list(self.threats[1])]
+        return board
+
+    def stoneMasks(self):
+        return list(self.stones)
+
+    def heuristic(self, player):
+        """Threats player has on the candidate cells against the opponent's, within -9..9."""
+        mine = sum(min(self.threat(player, cell), FIVE) for cell in self.candidates)
+        theirs = sum(min(self.threat(1 - player, cell), FIVE) for cell in self.candidates)
+        return 9.0 * (mine - theirs) / (mine + theirs + 1)
+
     def evaluate(self, player):
         if not self.game_over or self.current_player is None:
             return 0
@@ -102,7 +544,24 @@ class Board:
             return -10
 
 
-def minmax(board, player):
+# search on a fresh copy of the board per child instead of make/unmake,
+# slower but handy to verify unmakeMove against
+COPY_SEARCH = False
+
+
+def playMove(board, player, move):
+    if COPY_SEARCH:
+        board = board.copyBoard()
+    board.makeMove(player, move)
+    return board
+
+
+def takeBack(board, move):
+    if not COPY_SEARCH:
+        board.unmakeMove(move)
+
+
+def minmax(board, player, stats=None, ply=0):
     """
 
     ::pseudo code::
@@ -119,6 +578,9 @@ def minmax(board, player):
                 a := max(a, minimax(child, depth - 1))
         return a
     """
+    if stats is not None:
+        stats.node(ply)
+
     if board.isGameOver():
         return board.evaluate(player), None
 
@@ -130,9 +592,9 @@ def minmax(board, player):
         bestScore = float('inf')
 
     for move in board.getMoves():
-        newBoard = board.copyBoard()
-        newBoard.makeMove(curr_player, move)
-        score, _ = minmax(newBoard, player)
+        newBoard = playMove(board, curr_player, move)
+        score, _ = minmax(newBoard, player, stats, ply + 1)
+        takeBack(board, move)
         if curr_player == player:
             if score > bestScore:
                 bestScore = score
@@ -145,7 +607,10 @@ def minmax(board, player):
     return bestScore, bestMove
 
 
-def negamax(board, player):
+def negamax(board, player, stats=None, ply=0):
+    if stats is not None:
+        stats.node(ply)
+
     if board.isGameOver():
         if board.currentPlayer() == player:
             return -board.evaluate(player), None
@@ -156,9 +621,9 @@ def negamax(board, player):
     bestScore = -float('inf')
 
     for move in board.getMoves():
-        newBoard = board.copyBoard()
-        newBoard.makeMove(board.currentPlayer(), move)
-        score, _ = negamax(newBoard, player)
+        newBoard = playMove(board, board.currentPlayer(), move)
+        score, _ = negamax(newBoard, player, stats, ply + 1)
+        takeBack(board, move)
         score = -score
 
         if score > bestScore:
@@ -168,20 +633,42 @@ def negamax(board, player):
     return bestScore, bestMove
 
 
-def abnegamax(board, player, alpha, beta):
+def abnegamax(board, player, alpha, beta, table=None, depth=None, budget=None, stats=None, ply=0):
+    """
+    Negamax alpha-beta, scores are from the side to move's point of view.
+
+    With depth set, unfinished games depth plies down are scored by
+    heuristic(); budget is an optional deepening.Budget ticked per node and
+    stats an optional stats.SearchStats, with ply the distance to its root.
+    """
+    if budget is not None:
+        budget.tick()
+    if stats is not None:
+        stats.node(ply)
+
     if board.isGameOver():
         if board.currentPlayer() == player:
             return -board.evaluate(player), None
         else:
             return board.evaluate(player), None
 
+    if depth == 0:
+        return heuristic(board, board.currentPlayer()), None
+
+    moves = board.getMoves()
     bestMove = None
     bestScore = -float('inf')
 
-    for move in board.getMoves():
-        newBoard = board.copyBoard()
-        newBoard.makeMove(board.currentPlayer(), move)
-        score, _ = abnegamax(newBoard, player, -beta, -alpha)
+    if table is not None:
+        alphaOrig, betaOrig = alpha, beta
+        value, ttMove, key, symmetry = probeTable(table, board, depth, alpha, beta, moves)
+        if value is not None:
+            return value, ttMove
+
+    for move in moves:
+        newBoard = playMove(board, board.currentPlayer(), move)
+        score, _ = abnegamax(newBoard, player, -beta, -alpha, table, depth and depth - 1, budget, stats, ply + 1)
+        takeBack(board, move)
         score = -score
 
         if score > bestScore:
@@ -192,15 +679,121 @@ def abnegamax(board, player, alpha, beta):
             alpha = bestScore
 
         if bestScore >= beta:
+            if stats is not None:
+                stats.cutoff(move == moves[0])
             break
 
+    if table is not None:
+        storeTable(table, board, key, symmetry, depth, bestScore, alphaOrig, betaOrig, bestMove)
+
+    return bestScore, bestMove
+
+
+def pvs(board, player, alpha, beta, table=None, depth=None, budget=None, stats=None, ply=0):
+    """
+    Principal variation search (NegaScout), same arguments and result as
+    abnegamax. Every move after the first is tried with a null window above
+    alpha and only searched again with the full window when it fails high
+    inside it, which is rare with good move ordering.
+    """
+    if budget is not None:
+        budget.tick()
+    if stats is not None:
+        stats.node(ply)
+
+    if board.isGameOver():
+        if board.currentPlayer() == player:
+            return -board.evaluate(player), None
+        else:
+            return board.evaluate(player), None
+
+    if depth == 0:
+        return heuristic(board, board.currentPlayer()), None
+
+    moves = board.getMoves()
+    bestMove = None
+    bestScore = -float('inf')
+
+    if table is not None:
+        alphaOrig, betaOrig = alpha, beta
+        value, ttMove, key, symmetry = probeTable(table, board, depth, alpha, beta, moves)
+        if value is not None:
+            return value, ttMove
+
+    for move in moves:
+        newBoard = playMove(board, board.currentPlayer(), move)
+        if bestMove is None:
+            score, _ = pvs(newBoard, player, -beta, -alpha, table, depth and depth - 1, budget, stats, ply + 1)
+            score = -score
+        else:
+            score, _ = pvs(newBoard, player, -alpha - 1, -alpha, table, depth and depth - 1, budget, stats, ply + 1)
+            score = -score
+            if alpha < score < beta:
+                score, _ = pvs(newBoard, player, -beta, -score, table, depth and depth - 1, budget, stats, ply + 1)
+                score = -score
+        takeBack(board, move)
+
+        if score > bestScore:
+            bestScore = score
+            bestMove = move
+
+        if bestScore > alpha:
+            alpha = bestScore
+
+        if bestScore >= beta:
+            if stats is not None:
+                stats.cutoff(move == moves[0])
+            break
+
+    if table is not None:
+        storeTable(table, board, key, symmetry, depth, bestScore, alphaOrig, betaOrig, bestMove)
+
     return bestScore, bestMove
 
 
-def alphabeta(board, player, alpha, beta):
+def mtdf(board, player, guess=0, table=None, depth=None, budget=None, stats=None):
+    """
+    MTD(f): close in on the score of abnegamax(board, player, -inf, inf)
+    with null window searches only, starting at guess; the table keeps the
+    repeated passes cheap. The move returned is the first one in getMoves()
+    order that reaches the score, the same one alphabeta picks.
+    """
+    if board.isGameOver():
+        return abnegamax(board, player, -float('inf'), float('inf'), stats=stats)
+    if table is None:
+        table = TranspositionTable(1 << 16)
+
+    score = guess
+    lower, upper = -float('inf'), float('inf')
+    while lower < upper:
+        beta = score + 1 if score == lower else score
+        score, _ = abnegamax(board, player, beta - 1, beta, table, depth, budget, stats)
+        if score < beta:
+            upper = score
+        else:
+            lower = score
+
+    for move in board.getMoves():
+        newBoard = playMove(board, board.currentPlayer(), move)
+        value, _ = abnegamax(newBoard, player, -score, -score + 1, table, depth and depth - 1, budget, stats, 1)
+        takeBack(board, move)
+        if -value >= score:
+            return score, move
+
+
+def alphabeta(board, player, alpha, beta, table=None, depth=None, budget=None, stats=None, ply=0):
+    if budget is not None:
+        budget.tick()
+    if stats is not None:
+        stats.node(ply)
+
     if board.isGameOver():
         return board.evaluate(player), None
 
+    if depth == 0:
+        return heuristic(board, player), None
+
+    moves = board.getMoves()
     bestMove = None
     curr_player = board.currentPlayer()
     if curr_player == player:
@@ -208,10 +801,21 @@ def alphabeta(board, player, alpha, beta):
     else:
         bestScore = float('inf')
 
-    for move in board.getMoves():
-        newBoard = board.copyBoard()
-        newBoard.makeMove(curr_player, move)
-        score, _ = alphabeta(newBoard, player, alpha, beta)
+    # the table holds scores for the side to move, negate them on min nodes
+    if table is not None:
+        sign = 1 if curr_player == player else -1
+        alphaOrig, betaOrig = alpha, beta
+        if sign == 1:
+            value, ttMove, key, symmetry = probeTable(table, board, depth, alpha, beta, moves)
+        else:
+            value, ttMove, key, symmetry = probeTable(table, board, depth, -beta, -alpha, moves)
+        if value is not None:
+            return sign * value, ttMove
+
+    for move in moves:
+        newBoard = playMove(board, curr_player, move)
+        score, _ = alphabeta(newBoard, player, alpha, beta, table, depth and depth - 1, budget, stats, ply + 1)
+        takeBack(board, move)
         if curr_player == player:
             if score > bestScore:
                 bestScore = score
@@ -221,6 +825,8 @@ def alphabeta(board, player, alpha, beta):
                 alpha = score
 
             if alpha >= beta:
+                if stats is not None:
+                    stats.cutoff(move == moves[0])
                 break
         else:
             if score < bestScore:
@@ -231,16 +837,538 @@ def alphabeta(board, player, alpha, beta):
                 beta = score
 
             if alpha >= beta:
+                if stats is not None:
+                    stats.cutoff(move == moves[0])
                 break
 
+    if table is not None:
+        if sign == 1:
+            storeTable(table, board, key, symmetry, depth, bestScore, alphaOrig, betaOrig, bestMove)
+        else:
+            storeTable(table, board, key, symmetry, depth, -bestScore, -betaOrig, -alphaOrig, bestMove)
+
     return bestScore, bestMove
 
 
-def main(mode='minmax'):
+def deepeningSearch(board, player, seconds=None, nodes=None, table=None, search=abnegamax, stats=None):
+    """
+    Iterative deepening over search (abnegamax or alphabeta) within a wall
+    clock and/or node budget. The table carries each iteration's best moves
+    into the next one's ordering.
+
+    Returns (score, move, depth) of the deepest completed iteration; if not
+    even depth 1 completed, move is the first legal move.
+    """
+    budget = Budget(seconds, nodes)
+    if table is None:
+        table = TranspositionTable(1 << 16)
+    moves = board.getMoves()
+
+    # an interrupted search leaves moves on the board, so search copies
+    def run(depth):
+        return search(board.copyBoard(), player, -float('inf'), float('inf'), table, depth, budget, stats)
+
+    score, move, depth = iterativeDeepening(run, board.empty)
+    if move is None and moves:
+        move = moves[0]
+    return score, move, depth
+
+
+def searchRootMove(board, move, alpha):
+    """Score of a root move for the side to move, see parallel.rootSplit."""
+    player = board.currentPlayer()
+    board.makeMove(player, move)
+    score, _ = abnegamax(board, player, -float('inf'), -alpha, workerState()['table'])
+    return -score
+
+
+def parallelAlphabeta(board, player, workers=None, tableSize=1 << 16):
+    """
+    Same result as alphabeta(board, player, -inf, inf), with the root moves
+    searched in parallel on a pool of worker processes, the first one ahead
+    of the others, see parallel.rootSplit.
+    """
+    if board.isGameOver():
+        return board.evaluate(player), None
+
+    score, move = rootSplit(searchRootMove, board, board.getMoves(), workers, tableSize, best=10)
+    if board.currentPlayer() == player:
+        return score, move
+    else:
+        return -score, move
+
+
+_SYMMETRIES = {}
+_SYMMETRY_TABLES = {}
+
+
+def symmetries(size):
+    """
+    The 8 rotations and reflections of the board, each as a list giving the
+    cell every cell moves to; the first one is the identity.
+    """
+    if size not in _SYMMETRIES:
+        n = size - 1
+        maps = [lambda i, j: (i, j), lambda i, j: (j, n - i), lambda i, j: (n - i, n - j), lambda i, j: (n - j, i),
+                lambda i, j: (i, n - j), lambda i, j: (n - i, j), lambda i, j: (j, i), lambda i, j: (n - j, n - i)]
+        perms = []
+        for f in maps:
+            perm = []
+            for cell in range(size * size):
+                i, j = f(cell // size, cell % size)
+                perm.append(i * size + j)
+            perms.append(perm)
+        _SYMMETRIES[size] = perms
+    return _SYMMETRIES[size]
+
+
+def symmetryTables(size):
+    """
+    Per symmetry, the transformed bits of every value of every byte of a
+    stone mask, so a mask is transformed a byte at a time by transformMask.
+    """
+    if size not in _SYMMETRY_TABLES:
+        cells = size * size
+        tables = []
+        for perm in symmetries(size):
+            tables.append([[sum(1 << perm[8 * b + bit] for bit in range(8) if value >> bit & 1 and 8 * b + bit < cells)
+                            for value in range(256)] for b in range((cells + 7) // 8)])
+        _SYMMETRY_TABLES[size] = tables
+    return _SYMMETRY_TABLES[size]
+
+
+def transformMask(mask, table):
+    result = 0
+    for part in table:
+        result |= part[mask & 0xff]
+        mask >>= 8
+    return result
+
+
+_INVERSES = {}
+
+
+def inverseSymmetries(size):
+    if size not in _INVERSES:
+        inverses = []
+        for perm in symmetries(size):
+            inverse = [0] * len(perm)
+            for cell, image in enumerate(perm):
+                inverse[image] = cell
+            inverses.append(inverse)
+        _INVERSES[size] = inverses
+    return _INVERSES[size]
+
+
+def canonicalForm(size, x, o):
+    """
+    (key, symmetry) of the position with stone masks x and o: key is
+    x | o << size * size of the symmetric position with the smallest such
+    key, symmetry the index in symmetries(size) that maps the position to it.
+    """
+    cells = size * size
+    key, symmetry = None, 0
+    for index, table in enumerate(symmetryTables(size)):
+        k = transformMask(x, table) | transformMask(o, table) << cells
+        if key is None or k < key:
+            key, symmetry = k, index
+    return key, symmetry
+
+
+_IMAGE_BITS = {}
+
+
+def imageBits(size):
+    """[player][cell]: the bit of that stone in the key under every symmetry."""
+    if size not in _IMAGE_BITS:
+        cells = size * size
+        _IMAGE_BITS[size] = [[[1 << perm[cell] + player * cells for perm in symmetries(size)]
+                              for cell in range(cells)] for player in range(2)]
+    return _IMAGE_BITS[size]
+
+
+def canonical(board):
+    """canonicalForm() of the board, read off BitBoard.images when it has them."""
+    images = getattr(board, 'images', None)
+    if images is not None:
+        key = min(images)
+        return key, images.index(key)
+    x, o = board.stoneMasks()
+    return canonicalForm(board.cubsize, x, o)
+
+
+def mapMove(move, size, perm):
+    """Move (i, j) carried to the cell perm maps it to."""
+    if move is None:
+        return None
+    cell = perm[move[0] * size + move[1]]
+    return (cell // size, cell % size)
+
+
+def uniqueMoves(board):
+    """
+    getMoves() without moves that are symmetric to an earlier one, under
+    the symmetries that leave the board as it is.
+    """
+    x, o = board.stoneMasks()
+    size = board.cubsize
+    stabilizers = [perm for perm, table in zip(symmetries(size), symmetryTables(size))
+                   if transformMask(x, table) == x and transformMask(o, table) == o]
+    moves = []
+    seen = set()
+    for move in board.getMoves():
+        cell = move[0] * size + move[1]
+        if cell in seen:
+            continue
+        moves.append(move)
+        seen.update(perm[cell] for perm in stabilizers)
+    return moves
+
+
+class SymmetricTable(TranspositionTable):
+    """
+    Transposition table shared by all symmetric positions: the searchers key
+    it by canonical(board) instead of board.key and store moves in the
+    canonical orientation, mapping them back when probing.
+    """
+    def boardKey(self, board):
+        """(key, symmetry) of board's canonical form."""
+        key, symmetry = canonical(board)
+        # the low bits of a canonical key are just x's stones, spread them
+        # over the table; for keys under 64 bits, as up to 5x5, this is 1:1
+        key = key * 0x9e3779b97f4a7c15 & 0xffffffffffffffff
+        return key ^ key >> 32, symmetry
+
+
+def tableKey(table, board):
+    """(key, symmetry) under which board is kept in table."""
+    if isinstance(table, SymmetricTable):
+        return table.boardKey(board)
+    return board.key, 0
+
+
+def tableDraft(board, depth):
+    """
+    Draft of a search of board to depth, None to the end: getMoves() may
+    prune, so only the empty cells bound the plies left.
+    """
+    return board.empty if depth is None else depth
+
+
+def probeTable(table, board, depth, alpha, beta, moves):
+    """
+    Look board up in table for a search to depth within (alpha, beta).
+    Returns (value, ttMove, key, symmetry) with value None unless the entry
+    settles the search, and ttMove in board's orientation; moves is then
+    reordered in place to try ttMove first.
+    """
+    key, symmetry = tableKey(table, board)
+    value, ttMove = lookup(table, key, tableDraft(board, depth), alpha, beta)
+    if symmetry:
+        ttMove = mapMove(ttMove, board.cubsize, inverseSymmetries(board.cubsize)[symmetry])
+    if value is None and ttMove in moves:
+        moves.remove(ttMove)
+        moves.insert(0, ttMove)
+    return value, ttMove, key, symmetry
+
+
+def storeTable(table, board, key, symmetry, depth, score, alpha, beta, move):
+    """Store score of board searched to depth within (alpha, beta), under the key and symmetry probeTable gave."""
+    if symmetry:
+        move = mapMove(move, board.cubsize, symmetries(board.cubsize)[symmetry])
+    table.store(key, tableDraft(board, depth), boundFlag(score, alpha, beta), score, move)
+
+
+def symmetricSearch(board, player, table=None, stats=None):
+    """
+    Same result as abnegamax(board, player, -inf, inf), searching only one
+    of every set of symmetric root moves and sharing a SymmetricTable among
+    symmetric positions below the root.
+    """
+    if board.isGameOver():
+        if board.currentPlayer() == player:
+            return -board.evaluate(player), None
+        else:
+            return board.evaluate(player), None
+    if table is None:
+        table = SymmetricTable(1 << 16)
+
+    alpha, beta = -float('inf'), float('inf')
+    bestScore, bestMove = -float('inf'), None
+    for move in uniqueMoves(board):
+        newBoard = playMove(board, board.currentPlayer(), move)
+        score, _ = abnegamax(newBoard, player, -beta, -alpha, table, stats=stats, ply=1)
+        takeBack(board, move)
+        score = -score
+
+        if score > bestScore:
+            bestScore = score
+            bestMove = move
+
+        if bestScore > alpha:
+            alpha = bestScore
+
+    return bestScore, bestMove
+
+
+WIN = 1
+DRAW = 0
+LOSS = -1
+
+
+class RetrogradeTable:
+    """
+    Every unfinished position reachable from the empty board, up to the 8
+    symmetries, labeled WIN, DRAW or LOSS for the side to move together with
+    the plies to the end under perfect play: wins as fast and losses as slow
+    as possible.
+
+    Positions are keyed by x_stones | o_stones << size * size, in the
+    symmetry with the smallest key, and kept in an open addressing hash table
+    of flat arrays, so lookups are O(1) and cost a few bytes per position.
+    """
+    EMPTY = (1 << 64) - 1
+
+    def __init__(self, size=3, count=0):
+        self.size = size
+        self.capacity = 1
+        while self.capacity * 3 < count * 4 + 4:
+            self.capacity *= 2
+        self.count = 0
+        self.keys = array('Q', [self.EMPTY]) * self.capacity
+        self.outcomes = array('b', [0]) * self.capacity
+        self.distances = array('B', [0]) * self.capacity
+
+    def __len__(self):
+        return self.count
+
+    def _slot(self, key):
+        mask = self.capacity - 1
+        slot = (key * 0x9E3779B97F4A7C15 >> 24) & mask
+        keys = self.keys
+        while keys[slot] != key and keys[slot] != self.EMPTY:
+            slot = (slot + 1) & mask
+        return slot
+
+    def store(self, key, outcome, distance):
+        slot = self._slot(key)
+        if self.keys[slot] == self.EMPTY:
+            self.count += 1
+        self.keys[slot] = key
+        self.outcomes[slot] = outcome
+        self.distances[slot] = distance
+
+    def get(self, key):
+        slot = self._slot(key)
+        if self.keys[slot] == self.EMPTY:
+            return None
+        return self.outcomes[slot], self.distances[slot]
+
+    def canonicalKey(self, x, o):
+        return canonicalForm(self.size, x, o)[0]
+
+    def lookup(self, board):
+        """(outcome, distance) of an unfinished board for its side to move."""
+        x, o = board.stoneMasks()
+        return self.get(self.canonicalKey(x, o))
+
+    def bestMove(self, board):
+        """
+        A perfect move for the side to move, the first one in getMoves order
+        of the best outcome and distance; returns (outcome, distance, move).
+        """
+        stones = board.stoneMasks()
+        player = board.currentPlayer()
+        lines = lineMasks(self.size)
+        best = None
+        for move in board.getMoves():
+            cell = move[0] * self.size + move[1]
+            child = list(stones)
+            child[player] |= 1 << cell
+            if any(child[player] & line == line for line in lines[cell]):
+                result = (WIN, 1)
+            elif child[0] | child[1] == (1 << self.size * self.size) - 1:
+                result = (DRAW, 1)
+            else:
+                outcome, distance = self.get(self.canonicalKey(child[0], child[1]))
+                result = (-outcome, distance + 1)
+            if best is None or better(result, best[:2]):
+                best = result + (move,)
+        return best
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            array('Q', [self.size, self.capacity, self.count]).tofile(f)
+            self.keys.tofile(f)
+            self.outcomes.tofile(f)
+            self.distances.tofile(f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            header = array('Q')
+            header.fromfile(f, 3)
+            table = cls(header[0])
+            table.capacity, table.count = header[1], header[2]
+            table.keys = array('Q')
+            table.keys.fromfile(f, table.capacity)
+            table.outcomes = array('b')
+            table.outcomes.fromfile(f, table.capacity)
+            table.distances = array('B')
+            table.distances.fromfile(f, table.capacity)
+        return table
+
+
+def better(a, b):
+    """Whether (outcome, distance) a is better than b for the side to move."""
+    if a[0] != b[0]:
+        return a[0] > b[0]
+    if a[0] == LOSS:
+        return a[1] > b[1]
+    return a[1] < b[1]
+
+
+def retrograde(size=3, verbose=False):
+    """
+    Solve the whole game on a size x size board: enumerate every reachable
+    position up to symmetry, layer by layer, then label the layers from the
+    last one back to the empty board. Returns a RetrogradeTable.
+    """
+    cells = size * size
+    full = (1 << cells) - 1
+    lines = lineMasks(size)
+    tables = symmetryTables(size)
+    # per symmetry and player, the key bit of a stone on each cell
+    stoneBits = [[[1 << perm[cell] << player * cells for cell in range(cells)] for player in range(2)]
+                 for perm in symmetries(size)]
+
+    def children(key, player):
+        """(cell, canonical key or None when the game ends there, won) of every move."""
+        x, o = key & full, key >> cells
+        mine = (x, o)[player]
+        occupied = x | o
+        transformed = [(transformMask(x, table) | transformMask(o, table) << cells, bits[player])
+                       for table, bits in zip(tables, stoneBits)]
+        for cell in range(cells):
+            if occupied >> cell & 1:
+                continue
+            stones = mine | 1 << cell
+            if any(stones & line == line for line in lines[cell]):
+                yield cell, None, True
+            elif occupied | 1 << cell == full:
+                yield cell, None, False
+            else:
+                yield cell, min(parent | bits[cell] for parent, bits in transformed), False
+
+    layers = [array('Q', [0])]
+    for depth in range(cells - 1):
+        layer = set()
+        for key in layers[-1]:
+            for cell, child, won in children(key, depth % 2):
+                if child is not None:
+                    layer.add(child)
+        layers.append(array('Q', layer))
+        if verbose:
+            print('layer %d: %d positions' % (depth + 1, len(layer)))
+
+    table = RetrogradeTable(size, sum(len(layer) for layer in layers))
+    for depth in range(len(layers) - 1, -1, -1):
+        for key in layers[depth]:
+            best = None
+            for cell, child, won in children(key, depth % 2):
+                if won:
+                    best = (WIN, 1)
+                    break
+                if child is None:
+                    result = (DRAW, 1)
+                else:
+                    outcome, distance = table.get(child)
+                    result = (-outcome, distance + 1)
+                if best is None or better(result, best):
+                    best = result
+            table.store(key, best[0], best[1])
+        if verbose:
+            print('layer %d solved' % depth)
+    return table
+
+
+_LINE_MATRICES = {}
+
+
+def lineMatrix(size):
+    """
+    numpy (size * size, 2 * size + 2) matrix of the winning lines, column k
+    holding a 1 for every cell of line k, so that flattened boards times
+    it give the sum of the markers along every line.
+    """
+    import numpy
+    if size not in _LINE_MATRICES:
+        lineMasks(size)
+        lines = _LINES[size]
+        matrix = numpy.zeros((size * size, len(lines)), dtype=numpy.int32)
+        for k, line in enumerate(lines):
+            for cell in range(size * size):
+                if line >> cell & 1:
+                    matrix[cell, k] = 1
+        _LINE_MATRICES[size] = matrix
+    return _LINE_MATRICES[size]
+
+
+def packBoards(boards):
+    """(N, size, size) int8 numpy array of the markers of N boards of one size."""
+    import numpy
+    return numpy.array([board.toList() for board in boards], dtype=numpy.int8)
+
+
+def batchStatus(boards):
+    """
+    chkGameOver for a whole batch: boards is an (N, size, size) int8 array
+    as made by packBoards. Returns (terminal, winners, moves): whether each
+    game is over, the index of the player with a full line, -1 if nobody has
+    one, and the (N, size, size) mask of the empty cells, the legal moves.
+    Needs numpy, unlike the rest of this module.
+    """
+    import numpy
+    boards = numpy.asarray(boards, dtype=numpy.int8)
+    count, size = boards.shape[0], boards.shape[1]
+    sums = boards.reshape(count, size * size).astype(numpy.int32).dot(lineMatrix(size))
+    xwins = (sums == size).any(axis=1)
+    owins = (sums == -size).any(axis=1)
+    moves = boards == 0
+    full = ~moves.reshape(count, size * size).any(axis=1)
+    winners = numpy.where(xwins, 0, numpy.where(owins, 1, -1)).astype(numpy.int8)
+    return xwins | owins | full, winners, moves
+
+
+def batchEvaluate(boards, player):
+    """evaluate(player) of every board in the batch, see batchStatus."""
+    import numpy
+    _, winners, _ = batchStatus(boards)
+    return numpy.where(winners == player, 10, numpy.where(winners == 1 - player, -10, 0)).astype(numpy.int8)
+
+
+def showStats(stats, table=None, statsFile=None):
+    stats.stop(table)
+    print(stats)
+    if statsFile is not None:
+        with open(statsFile, 'a') as f:
+            f.write(stats.toJson() + '\n')
+
+
+def main(mode='minmax', size=3, bitboard=False, table=None, seconds=1.0, workers=None, solved=None,
+         statsFile=None, k=None):
     if mode == 'random':
         random.seed(None)
 
-    board = Board()
+    if mode == 'retrograde' and solved is None:
+        solved = retrograde(size)
+
+    if k:
+        board = GomokuBoard(size, k)
+    elif bitboard:
+        board = BitBoard(size)
+    else:
+        board = Board(size)
     while True:
         if board.isGameOver():
             print(board)
@@ -248,7 +1376,7 @@ def main(mode='minmax'):
             break
         print(board)
 
-        loc_str = raw_input('please take your turn: ')
+        loc_str = input('please take your turn: ')
         if not loc_str:
             print('quit..')
             break
@@ -256,41 +1384,75 @@ def main(mode='minmax'):
         if not board.makeMove(0, (x, y)):
             continue
 
+        stats = SearchStats(mode)
+        stats.start(table)
         if mode == 'random':
-            start = time.clock()
             moves = board.getMoves()
             if moves:
                 move = moves[random.randint(0, len(moves)-1)]
                 board.makeMove(1, move)
-            print('Elapsed: ', time.clock() - start)
+            showStats(stats, table, statsFile)
 
         if mode == 'minmax':
-            start = time.clock()
-            _, move = minmax(board, 1)
+            _, move = minmax(board, 1, stats)
             if move:
                 board.makeMove(1, move)
-            print('Elapsed: ', time.clock() - start)
+            showStats(stats, table, statsFile)
 
         if mode == 'negamax':
-            start = time.clock()
-            _, move = negamax(board, 1)
+            _, move = negamax(board, 1, stats)
             if move:
                 board.makeMove(1, move)
-            print('Elapsed: ', time.clock() - start)
+            showStats(stats, table, statsFile)
 
         if mode == 'alphabeta':
-            start = time.clock()
-            _, move = alphabeta(board, 1, -float('inf'), float('inf'))
+            _, move = alphabeta(board, 1, -float('inf'), float('inf'), table, stats=stats)
             if move:
                 board.makeMove(1, move)
-            print('Elapsed: ', time.clock() - start)
+            showStats(stats, table, statsFile)
 
         if mode == 'abnegamax':
-            start = time.clock()
-            _, move = abnegamax(board, 1, -float('inf'), float('inf'))
+            _, move = abnegamax(board, 1, -float('inf'), float('inf'), table, stats=stats)
             if move:
                 board.makeMove(1, move)
-            print('Elapsed: ', time.clock() - start)
+            showStats(stats, table, statsFile)
+
+        if mode == 'pvs':
+            _, move = pvs(board, 1, -float('inf'), float('inf'), table, stats=stats)
+            if move:
+                board.makeMove(1, move)
+            showStats(stats, table, statsFile)
+
+        if mode == 'mtdf':
+            _, move = mtdf(board, 1, table=table, stats=stats)
+            if move:
+                board.makeMove(1, move)
+            showStats(stats, table, statsFile)
+
+        if mode == 'deepening':
+            _, move, depth = deepeningSearch(board, 1, seconds, table=table, stats=stats)
+            if move:
+                board.makeMove(1, move)
+            showStats(stats, table, statsFile)
+            print('Depth: ', depth)
+
+        if mode == 'symmetric':
+            _, move = symmetricSearch(board, 1, table, stats)
+            if move:
+                board.makeMove(1, move)
+            showStats(stats, table, statsFile)
+
+        if mode == 'retrograde':
+            if not board.isGameOver():
+                _, _, move = solved.bestMove(board)
+                board.makeMove(1, move)
+            showStats(stats, table, statsFile)
+
+        if mode == 'parallel':
+            _, move = parallelAlphabeta(board, 1, workers)
+            if move:
+                board.makeMove(1, move)
+            showStats(stats, table, statsFile)
 
 
 if __name__ == '__main__':
@@ -298,9 +1460,40 @@ if __name__ == '__main__':
 
     parser = OptionParser()
     parser.add_option('-m', '--mode', dest='mode', action='store', default='random', help='select algorithm')
+    parser.add_option('-s', '--size', dest='size', action='store', type='int', default=3, help='board size')
+    parser.add_option('-k', '--in-a-row', dest='k', action='store', type='int', default=None, help='play k in a row (gomoku) instead of full lines')
+    parser.add_option('-b', '--bitboard', dest='bitboard', action='store_true', default=False, help='use bitboard')
+    parser.add_option('-c', '--copy', dest='copy', action='store_true', default=False, help='search on board copies')
+    parser.add_option('-t', '--tt-size', dest='tt_size', action='store', type='int', default=0, help='transposition table entries')
+    parser.add_option('-p', '--tt-policy', dest='tt_policy', action='store', default='depth', help='replacement policy: depth or always')
+    parser.add_option('-S', '--symmetric', dest='symmetric', action='store_true', default=False, help='share table entries among symmetric positions')
+    parser.add_option('-T', '--time', dest='seconds', action='store', type='float', default=1.0, help='seconds per move for deepening')
+    parser.add_option('-j', '--stats', dest='stats', action='store', default=None, help='append search statistics to this file as json lines')
+    parser.add_option('-w', '--workers', dest='workers', action='store', type='int', default=None, help='worker processes for parallel')
+    parser.add_option('-r', '--retrograde-file', dest='solved', action='store', default=None, help='solved game file for retrograde, built if missing')
     opts, args = parser.parse_args()
-
-    if opts.mode in ('random', 'minmax', 'negamax', 'alphabeta', 'abnegamax'):
-        main(mode=opts.mode)
+    COPY_SEARCH = opts.copy
+
+    table = None
+    if opts.symmetric or opts.mode == 'symmetric':
+        table = SymmetricTable(opts.tt_size or 1 << 16, opts.tt_policy)
+    elif opts.tt_size:
+        table = TranspositionTable(opts.tt_size, opts.tt_policy)
+
+    solved = None
+    if opts.mode == 'retrograde' and opts.solved:
+        import os
+        if os.path.exists(opts.solved):
+            solved = RetrogradeTable.load(opts.solved)
+        else:
+            solved = retrograde(opts.size, verbose=True)
+            solved.save(opts.solved)
+
+    if opts.mode in ('random', 'minmax', 'negamax', 'alphabeta', 'abnegamax', 'pvs', 'mtdf', 'deepening', 'parallel',
+                     'retrograde', 'symmetric'):
+        main(mode=opts.mode, size=opts.size, bitboard=opts.bitboard, table=table, seconds=opts.seconds,
+             workers=opts.workers, solved=solved, statsFile=opts.stats, k=opts.k)
+        if table is not None:
+            print('Table: ', table.stats())
     else:
         print('unsupported mode')
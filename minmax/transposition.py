@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from collections import OrderedDict
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+class TranspositionTable:
+    """
+    Fixed size table of searched positions, indexed by key % size.
+
+    Every slot holds (key, depth, flag, value, move), where flag tells whether
+    value is the exact score or only a lower/upper bound of it. When two keys
+    fight for a slot, the 'depth' policy keeps the deeper search while the
+    'always' policy keeps the newest one.
+    """
+    def __init__(self, size=1 << 16, policy='depth'):
+        if policy not in ('depth', 'always'):
+            raise ValueError('unsupported replacement policy: %s' % policy)
+        self.size = size
+        self.policy = policy
+        self.slots = [None] * size
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+
+    def __len__(self):
+        return len(self.slots) - self.slots.count(None)
+
+    def probe(self, key):
+        entry = self.slots[key % self.size]
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] != key:
+            self.collisions += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def store(self, key, depth, flag, value, move=None):
+        index = key % self.size
+        entry = self.slots[index]
+        if entry is not None and entry[0] != key and self.policy == 'depth' and entry[1] > depth:
+            return
+        self.slots[index] = (key, depth, flag, value, move)
+
+    def items(self):
+        return [entry for entry in self.slots if entry is not None]
+
+    def clear(self):
+        self.slots = [None] * self.size
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+
+    def stats(self):
+        return {
+            'size': self.size,
+            'used': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'collisions': self.collisions,
+        }
+
+
+class LRUCache:
+    """
+    Up to size values by key, evicting the least recently used one when
+    full. get() counts hits and misses; values must not be None.
+    """
+    def __init__(self, size=1 << 16):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        value = self.entries.pop(key, None)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.entries.pop(key, None)
+        if len(self.entries) >= self.size:
+            self.entries.popitem(last=False)
+        self.entries[key] = value
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        probes = self.hits + self.misses
+        return {
+            'size': self.size,
+            'used': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': probes and float(self.hits) / probes,
+        }
+
+
+class LRUTable(LRUCache):
+    """
+    Same interface as TranspositionTable, but keeps up to size entries by key
+    and evicts the least recently used one when full.
+    """
+    policy = 'lru'
+    # keys never share a slot
+    collisions = 0
+
+    def probe(self, key):
+        return self.get(key)
+
+    def store(self, key, depth, flag, value, move=None):
+        self.put(key, (key, depth, flag, value, move))
+
+    def items(self):
+        return list(self.entries.values())
+
+    def stats(self):
+        stats = LRUCache.stats(self)
+        stats['collisions'] = self.collisions
+        return stats
+
+
+def newTable(size=1 << 16, policy='depth'):
+    if policy == 'lru':
+        return LRUTable(size)
+    return TranspositionTable(size, policy)
+
+
+def lookup(table, key, depth, alpha, beta):
+    """
+    Probe table for a position searched at least depth deep.
+
+    Returns (value, move): value is not None only when the stored entry
+    already decides the (alpha, beta) window, move is the stored best move,
+    if any, for the caller to try first.
+    """
+    entry = table.probe(key)
+    if entry is None:
+        return None, None
+
+    _, entry_depth, flag, value, move = entry
+    if entry_depth >= depth:
+        if flag == EXACT:
+            return value, move
+        if flag == LOWER and value >= beta:
+            return value, move
+        if flag == UPPER and value <= alpha:
+            return value, move
+
+    return None, move
+
+
+def boundFlag(value, alpha, beta):
+    if value <= alpha:
+        return UPPER
+    if value >= beta:
+        return LOWER
+    return EXACT
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Consistency checks of the fast paths against the plain ones they stand in
+for, on random positions: legal move lookup against move generation,
+parallel searches against serial ones, numpy batch evaluation against the
+boards' own, and table searches on pruned gomoku moves against searches
+without a table. Every check prints what it disagrees on; the exit status
+is 1 if any did.
+"""
+
+import importlib
+import random
+import sys
+from itertools import product
+
+import landlord
+from transposition import TranspositionTable
+
+tictactoe = importlib.import_module('tic-tac-toe')
+
+INF = float('inf')
+
+DECK = [card for card in range(landlord.Card.THREE, landlord.Card.TWO + 1) for i in range(4)] + \
+    [landlord.Card.BJOKER, landlord.Card.RJOKER]
+
+
+def randomLandlord(rng, lordCards, farmerCards, facing=True):
+    """A random deal, the lord facing a random move of the farmer's if facing."""
+    cards = rng.sample(DECK, lordCards + farmerCards)
+    lord, farmer = cards[:lordCards], cards[lordCards:]
+    last = None
+    if facing and rng.random() < 0.7:
+        last = rng.choice(landlord.getNextMoves(farmer, landlord.CardPattern.PASS, -1))
+    return landlord.Board(lord, farmer, last)
+
+
+def straightDeal(rng):
+    """The lord holding a straight one rank above one of the same length it faces, plus spare cards."""
+    length = rng.randint(5, 11)
+    start = rng.randint(landlord.Card.THREE, landlord.Card.ACE - length)
+    played = list(range(start, start + length))
+    lord = list(range(start + 1, start + length + 1))
+    rest = list(DECK)
+    for card in played + lord:
+        rest.remove(card)
+    rng.shuffle(rest)
+    lord += rest[:rng.randint(0, 12 - length)]
+    farmer = rest[12:12 + rng.randint(1, 17)]
+    return landlord.Board(lord, farmer, landlord.Move(played).parse())
+
+
+def randomTictactoe(rng, size, plies, cls=None):
+    """A board of size after up to plies random moves, stopping at the end of the game."""
+    board = (cls or tictactoe.BitBoard)(size)
+    for i in range(plies):
+        if board.isGameOver():
+            break
+        board.makeMove(board.currentPlayer(), rng.choice(board.getMoves()))
+    return board
+
+
+def checkLegalMoves(rng, positions):
+    """legalMove on every part of the hand agrees with legalMoveSet, which has no duplicates."""
+    failures = []
+    for i in range(positions):
+        if i % 4 == 3:
+            board = straightDeal(rng)
+        else:
+            board = randomLandlord(rng, rng.randint(1, 12), rng.randint(11, 17))
+        moves = board.getNextMoves()
+        legal = landlord.legalMoveSet(board)
+        if len(legal) != len(moves):
+            failures.append('%s: getNextMoves has duplicates' % board)
+        hand = board.playerA
+        ranks = hand.ranks()
+        for counts in product(*[range(hand.count(card) + 1) for card in ranks]):
+            cards = [card for card, count in zip(ranks, counts) for j in range(count)]
+            move = landlord.legalMove(board, cards)
+            if (move is not None) != (tuple(cards) in legal) or (move is not None and legal[move.cards] is not move):
+                failures.append('%s: legalMove(%s) is %r' % (board, landlord.Card.revert(cards), move))
+        for cards in ([landlord.Card.RJOKER] * 2, [None], [0], [landlord.Card.THREE] * 5):
+            if landlord.legalMove(board, cards) is not None:
+                failures.append('%s: legalMove(%s) accepted' % (board, cards))
+    return failures
+
+
+def checkParallel(rng, positions):
+    """parallelAlphabeta and parallelMinmax find the serial score and move."""
+    failures = []
+    for i in range(positions):
+        board = randomTictactoe(rng, 3, rng.randint(0, 4))
+        if board.isGameOver():
+            continue
+        player = board.currentPlayer()
+        serial = tictactoe.alphabeta(board.copyBoard(), player, -INF, INF)
+        parallel = tictactoe.parallelAlphabeta(board.copyBoard(), player, workers=2)
+        if serial != parallel:
+            failures.append('tic-tac-toe\n%s\n: alphabeta %s, parallelAlphabeta %s' % (board, serial, parallel))
+
+    for i in range(positions):
+        board = randomLandlord(rng, rng.randint(2, 6), rng.randint(2, 6))
+        serial = landlord.minmax(board, -INF, INF)
+        parallel = landlord.parallelMinmax(board, workers=2)
+        if serial != parallel:
+            failures.append('landlord %s: minmax %s, parallelMinmax %s' % (board, serial, parallel))
+    return failures
+
+
+def checkBatch(rng, positions):
+    """batchStatus and batchEvaluate agree with chkGameOver, evaluate and getMoves."""
+    try:
+        import numpy
+    except ImportError:
+        print('  numpy is not installed, skipped')
+        return []
+
+    failures = []
+    for size in range(1, 6):
+        boards = [randomTictactoe(rng, size, rng.randint(0, size * size)) for i in range(positions)]
+        terminal, winners, moves = tictactoe.batchStatus(tictactoe.packBoards(boards))
+        scores = [tictactoe.batchEvaluate(tictactoe.packBoards(boards), player) for player in range(2)]
+        for index, board in enumerate(boards):
+            over = board.isGameOver()
+            winner = board.currentPlayer() if over and board.currentPlayer() is not None else -1
+            empty = set(board.getMoves())
+            mask = set(zip(*numpy.nonzero(moves[index])))
+            if bool(terminal[index]) != over or winners[index] != winner or mask != empty or \
+                    any(scores[player][index] != board.evaluate(player) for player in range(2)):
+                failures.append('%dx%d\n%s\n: batchStatus %s, %s' % (size, size, board, terminal[index], winners[index]))
+    return failures
+
+
+def checkGomokuTable(rng, positions):
+    """abnegamax deepened with one table finds the scores of searches without one."""
+    failures = []
+    for i in range(positions):
+        board = tictactoe.GomokuBoard(9, 4)
+        for ply in range(rng.randint(0, 8)):
+            if board.isGameOver():
+                break
+            board.makeMove(board.currentPlayer(), rng.choice(board.getMoves()))
+        if board.isGameOver():
+            continue
+        player = board.currentPlayer()
+        table = TranspositionTable(1 << 16)
+        for depth in range(1, 4):
+            cached, _ = tictactoe.abnegamax(board, player, -INF, INF, table, depth)
+            plain, _ = tictactoe.abnegamax(board, player, -INF, INF, None, depth)
+            if cached != plain:
+                failures.append('gomoku\n%s\n: depth %d, %s with the table, %s without' % (board, depth, cached, plain))
+    return failures
+
+
+# name, check(rng, positions), positions, positions with --quick
+CHECKS = [
+    ('legal-moves', checkLegalMoves, 200, 40),
+    ('parallel', checkParallel, 6, 2),
+    ('batch', checkBatch, 4000, 500),
+    ('gomoku-table', checkGomokuTable, 40, 10),
+]
+
+
+def run(quick=False, select=None, seed=1):
+    """Run the checks, returns the number of failures."""
+    failed = 0
+    for name, check, positions, quickPositions in CHECKS:
+        if select and select not in name:
+            continue
+        print('%s: %s' % (name, check.__doc__))
+        failures = check(random.Random(seed), quickPositions if quick else positions)
+        for failure in failures[:10]:
+            print('  FAILED %s' % failure)
+        print('  %s' % (failures and '%d failures' % len(failures) or 'ok'))
+        failed += len(failures)
+    return failed
+
+
+if __name__ == '__main__':
+    from optparse import OptionParser
+
+    parser = OptionParser()
+    parser.add_option('-q', '--quick', dest='quick', action='store_true', default=False, help='check fewer positions')
+    parser.add_option('-k', '--select', dest='select', action='store', default=None, help='only checks containing this')
+    parser.add_option('-s', '--seed', dest='seed', action='store', type='int', default=1, help='seed of the random positions')
+    opts, args = parser.parse_args()
+
+    sys.exit(run(opts.quick, opts.select, opts.seed) and 1 or 0)